@@ -1,14 +1,69 @@
 import sys
 import os
-from flask import Flask, send_from_directory, request
+import time
+from flask import Flask, send_from_directory, request, g
 import pandas as pd
 import pickle
 
-with open('../models/salary_prediction_xgboost_v1.pkl', 'rb') as file:
+from explanations import ContributionCache, CATEGORY_COLUMNS, FEATURE_COLUMNS
+from drift_monitor import DriftMonitor
+from prediction_cache import PredictionCache
+from fallback import LookupTableModel, LoadShedder
+from request_capture import RequestCapture, ENDPOINTS as CAPTURED_ENDPOINTS
+
+with open(os.getenv('MODEL_PATH', '../models/salary_prediction_xgboost_v1.pkl'), 'rb') as file:
     model = pickle.load(file)
 
+multi_predictions = PredictionCache(model)
+
+# Explanations are only available for pipelines whose preprocessing is a single ColumnTransformer
+try:
+    explanations = ContributionCache(model)
+except ValueError as error:
+    print(f"/explain-prediction is disabled: {error}", file = sys.stderr)
+    explanations = None
+
+# Optionally precompute the explanations of the category combinations listed in a CSV file (with a column per category feature)
+if explanations is not None and os.getenv('PRECOMPUTE_EXPLANATIONS'):
+    common_combinations = pd.read_csv(os.getenv('PRECOMPUTE_EXPLANATIONS'), usecols = CATEGORY_COLUMNS)
+    explanations.precompute(common_combinations[CATEGORY_COLUMNS].itertuples(index = False, name = None))
+
+# Compiled BaselineModel used while the XGBoost model is overloaded, see BaselineModel().compile_lookup_table()
+fallback_path = os.getenv('FALLBACK_MODEL', '../models/salary_prediction_baseline_v1.npz')
+fallback_model = LookupTableModel(fallback_path) if os.path.exists(fallback_path) else None
+load_shedder = LoadShedder(
+    max_in_flight = int(os.getenv('SHED_MAX_IN_FLIGHT', 8)),
+    max_latency_ms = float(os.getenv('SHED_MAX_LATENCY_MS', 500)),
+    probe_interval = float(os.getenv('SHED_PROBE_INTERVAL', 1.0))
+)
+
+# Compare the requests with the training profile if one exists, see drift_monitor.py to create it
+drift_profile = os.getenv('DRIFT_PROFILE', 'training_profile.json')
+drift_monitor = DriftMonitor.from_model(model, drift_profile if os.path.exists(drift_profile) else None)
+
+# Optionally capture the prediction requests to binary log files in this directory, see request_capture.py
+request_capture = None
+if os.getenv('CAPTURE_DIR'):
+    request_capture = RequestCapture(os.getenv('CAPTURE_DIR'), max_file_bytes = int(os.getenv('CAPTURE_MAX_FILE_MB', 64)) * 1_000_000)
+
 app = Flask(__name__, static_folder='../front-end/build', static_url_path='')
 
+
+@app.before_request
+def start_timer():
+    if request_capture is not None:
+        g.arrival_time = time.time()
+        g.start = time.perf_counter()
+
+
+@app.after_request
+def capture_request(response):
+    # Queued for the background writer, so capturing doesn't add the write time to the request
+    if request_capture is not None and request.path in CAPTURED_ENDPOINTS:
+        request_capture.record(request.path, request.get_data(), g.arrival_time, (time.perf_counter() - g.start) * 1000)
+    return response
+
+
 @app.route('/')
 @app.route('/index')
 def index():
@@ -22,6 +77,16 @@ def favicon():
     return send_from_directory(app.static_folder, 'favicon.ico')
 
 
+def predict_with_fallback(data, predict, kind):
+    """Predict with the XGBoost model, or with the fallback model when the load shedding thresholds are crossed.
+    The latency is tracked separately for every 'kind' of request. Returns the predictions and the name of the model that made them"""
+    if fallback_model is not None and load_shedder.use_fallback(kind, len(data)):
+        return fallback_model.predict(data), 'baseline'
+
+    with load_shedder.track(kind, len(data)):
+        return predict(data), 'xgboost'
+
+
 @app.route('/single-prediction', methods = ['POST'])
 def submit_predictions():
 
@@ -31,28 +96,54 @@ def submit_predictions():
     if isinstance(req, dict):
         req = [req]
 
-    req_df = pd.DataFrame(req)
-    predicted_salary = model.predict(req_df)
+    # JSON objects have no column order, the model's preprocessing needs the columns it was fit with in that order
+    req_df = pd.DataFrame(req)[FEATURE_COLUMNS]
+    predicted_salary, model_name = predict_with_fallback(req_df, model.predict, 'single')
+    drift_monitor.submit(req_df, predicted_salary)
     
-    return {'message': predicted_salary.tolist()}
+    return {'message': predicted_salary.tolist(), 'model': model_name}
 
 
 @app.route('/multiple-prediction', methods = ['POST'])
 def multi_predict():
-    # Get json data from request
+    # Get json data from request, the front-end only sends the jobs added since its last submit
     req = request.get_json()
     # Make a DataFrame and separate the id's for each row of data
     req_df = pd.DataFrame(req)
     output_ids = req_df.id
 
-    req_df.drop(columns='id', inplace=True)
-    # Get predictions, convert to list because np.array is not JSON serializable
-    preds = model.predict(req_df).tolist()
+    req_df = req_df[FEATURE_COLUMNS]
+    # Get predictions (rows that were scored before are reused), convert to list because np.array is not JSON serializable
+    preds, model_name = predict_with_fallback(req_df, multi_predictions.predict, 'multiple')
+    drift_monitor.submit(req_df, preds)
+    preds = preds.tolist()
 
     # Return a dictionary with id's as keys and values being salaries
     output = {id:pred for id, pred in zip(output_ids, preds)}
 
-    return {'message': output}
+    return {'message': output, 'model': model_name}
+
+
+@app.route('/explain-prediction', methods = ['POST'])
+def explain_predictions():
+    # Same input as /single-prediction, returns the contribution of each feature (and the 'bias') for every job,
+    # the contributions of a job sum to its predicted salary
+    if explanations is None:
+        return {'message': 'Explanations are not available for the deployed model'}, 501
+
+    req = request.get_json()
+    if isinstance(req, dict):
+        req = [req]
+
+    contributions = explanations.explain(pd.DataFrame(req))
+
+    return {'message': contributions.astype(float).to_dict(orient = 'records')}
+
+
+@app.route('/drift-report')
+def drift_report():
+    # Quantiles of the requests seen so far, and their drift scores against the training profile (None without a profile)
+    return {'message': drift_monitor.report()}
 
 
 if __name__ == "__main__":
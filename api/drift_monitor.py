@@ -0,0 +1,244 @@
+"""
+Streaming monitor of the distribution of the requests to the prediction endpoints, compared with the training data.
+
+Every request's features and predictions are put on a bounded queue, and a background thread folds them into
+fixed-size sketches: a counter per category level, and fixed-bin histograms for the numeric features and the predicted
+salary, which give quantiles within one bin width. Memory use only depends on the number of levels and bins.
+
+The training profile is the same sketches computed on the training data, create it with (from the api directory):
+    python drift_monitor.py <train.csv|train.parquet> training_profile.json
+"""
+import sys
+import json
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+
+# Histogram bins (low, high, number of bins) of the numeric values. Values outside the range are counted in an
+# underflow and an overflow bin, so out of range requests still show up as drift.
+HISTOGRAM_BINS = {
+    'yearsExperience': (0, 25, 25),
+    'milesFromMetropolis': (0, 100, 100),
+    'predicted_salary': (0, 400, 400)
+}
+
+# Added to every bin frequency before computing the PSI, so empty bins don't give infinite scores
+PSI_EPSILON = 1e-4
+
+
+class CategorySketch:
+    def __init__(self, levels):
+        """Counts of every level of a categorical feature, the last count is for unknown levels"""
+        self.levels = pd.Index(levels)
+        self.counts = np.zeros(len(levels) + 1, dtype = np.int64)
+
+    def update(self, values):
+        # Unknown levels have the code -1, shift the codes so they are counted in the first bin, then move it to the end
+        codes = self.levels.get_indexer(values) + 1
+        self.counts += np.roll(np.bincount(codes, minlength = len(self.counts)), -1)
+
+    def to_dict(self):
+        return {'levels': list(self.levels), 'counts': self.counts.tolist()}
+
+
+class HistogramSketch:
+    def __init__(self, low, high, n_bins):
+        """Fixed-bin histogram of a numeric value, with an underflow (first) and overflow (last) bin"""
+        self.low, self.high, self.n_bins = low, high, n_bins
+        self.width = (high - low) / n_bins
+        self.counts = np.zeros(n_bins + 2, dtype = np.int64)
+
+    def update(self, values):
+        values = np.asarray(values, dtype = np.float64)
+        bins = np.clip(np.floor((values - self.low) / self.width) + 1, 0, self.n_bins + 1).astype(np.int64)
+        self.counts += np.bincount(bins, minlength = len(self.counts))
+
+    def quantiles(self, qs):
+        """Quantiles interpolated within the bins, accurate to one bin width"""
+        total = self.counts.sum()
+        if total == 0:
+            return [None] * len(qs)
+
+        cumulative = np.cumsum(self.counts) / total
+        # Bin i (of the inner bins) covers [low + (i - 1) * width, low + i * width)
+        edges = self.low + (np.arange(len(self.counts)) - 1) * self.width
+        results = []
+        for q in qs:
+            i = int(np.searchsorted(cumulative, q))
+            previous = cumulative[i - 1] if i > 0 else 0
+            fraction = (q - previous) / (cumulative[i] - previous) if cumulative[i] > previous else 0
+            results.append(float(np.clip(edges[i] + fraction * self.width, self.low, self.high)))
+
+        return results
+
+    def to_dict(self):
+        return {'low': self.low, 'high': self.high, 'n_bins': self.n_bins, 'counts': self.counts.tolist()}
+
+
+class DriftMonitor:
+    def __init__(self, category_levels, profile = None, max_queue = 1000):
+        """
+        Parameters
+        ----------
+
+        category_levels : dictionary of categorical feature -> list of its levels
+        profile : optional training profile (a dictionary from make_profile()) to compute drift scores against
+        max_queue : maximum number of requests waiting to be added to the sketches, requests are dropped (and counted)
+            when the queue is full, so monitoring never blocks or slows down the requests
+        """
+        self.profile = profile
+        self.categories = {col: CategorySketch(levels) for col, levels in category_levels.items()}
+        self.histograms = {name: HistogramSketch(*bins) for name, bins in HISTOGRAM_BINS.items()}
+        if profile:
+            # Use the levels and bins of the profile, so both sets of sketches can be compared
+            self.categories = {col: CategorySketch(sketch['levels']) for col, sketch in profile['categories'].items()}
+            self.histograms = {name: HistogramSketch(sketch['low'], sketch['high'], sketch['n_bins']) for name, sketch in profile['histograms'].items()}
+
+        self.rows_seen = 0
+        self.dropped_requests = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize = max_queue)
+        self._thread = threading.Thread(target = self._run, name = 'drift-monitor', daemon = True)
+        self._thread.start()
+
+    @classmethod
+    def from_model(cls, model, profile_path = None, **kwargs):
+        """Monitor with the category levels of the model pipeline's ordinal encoder, and the training profile from a JSON file"""
+        profile = None
+        if profile_path:
+            with open(profile_path) as file:
+                profile = json.load(file)
+
+        return cls(_model_category_levels(model), profile = profile, **kwargs)
+
+    def submit(self, data: pd.DataFrame, predictions):
+        """Queue the features and predictions of a request, without waiting for the sketches to be updated"""
+        try:
+            self._queue.put_nowait((data, predictions))
+        except queue.Full:
+            self.dropped_requests += 1
+
+    def report(self, quantiles = (0.05, 0.25, 0.5, 0.75, 0.95)) -> dict:
+        """Rows seen, dropped requests, quantiles of the numeric sketches and drift scores against the training profile"""
+        with self._lock:
+            report = {
+                'rows_seen': self.rows_seen,
+                'dropped_requests': self.dropped_requests,
+                'quantiles': {name: dict(zip(map(str, quantiles), sketch.quantiles(quantiles))) for name, sketch in self.histograms.items()},
+                'drift_scores': self.drift_scores() if self.profile else None
+            }
+
+        return report
+
+    def drift_scores(self) -> dict:
+        """Population stability index (PSI) of every sketch against the profile, plus the total variation distance for
+        categorical features and the Kolmogorov-Smirnov statistic for numeric values. A PSI above 0.2 is usually considered drift."""
+        scores = {}
+        for col, sketch in self.categories.items():
+            expected = np.asarray(self.profile['categories'][col]['counts'])
+            scores[col] = {'psi': _psi(sketch.counts, expected), 'total_variation': _total_variation(sketch.counts, expected)}
+
+        for name, sketch in self.histograms.items():
+            expected = np.asarray(self.profile['histograms'][name]['counts'])
+            scores[name] = {'psi': _psi(sketch.counts, expected), 'ks': _ks_statistic(sketch.counts, expected)}
+
+        return scores
+
+    def wait_until_idle(self):
+        """Block until every queued request has been added to the sketches"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            data, predictions = self._queue.get()
+            try:
+                self._update(data, predictions)
+            except Exception as error:
+                # A malformed request must not stop the monitor, it was already answered by the endpoint
+                print(f"Drift monitor could not process a request: {error}", file = sys.stderr)
+            finally:
+                self._queue.task_done()
+
+    def _update(self, data, predictions):
+        with self._lock:
+            for col, sketch in self.categories.items():
+                sketch.update(data[col].to_numpy())
+            for name, sketch in self.histograms.items():
+                sketch.update(predictions if name == 'predicted_salary' else data[name].to_numpy())
+            self.rows_seen += len(data)
+
+
+def make_profile(data: pd.DataFrame, predictions, category_levels) -> dict:
+    """Training profile for DriftMonitor, from the training features and the model's predictions on them"""
+    categories = {col: CategorySketch(levels) for col, levels in category_levels.items()}
+    histograms = {name: HistogramSketch(*bins) for name, bins in HISTOGRAM_BINS.items()}
+
+    for col, sketch in categories.items():
+        sketch.update(data[col].to_numpy())
+    for name, sketch in histograms.items():
+        sketch.update(predictions if name == 'predicted_salary' else data[name].to_numpy())
+
+    return {
+        'categories': {col: sketch.to_dict() for col, sketch in categories.items()},
+        'histograms': {name: sketch.to_dict() for name, sketch in histograms.items()}
+    }
+
+
+def _model_category_levels(model) -> dict:
+    """Categorical columns and their levels, from the fitted ordinal encoder(s) of the model's ColumnTransformer.
+    Empty when the pipeline has no ColumnTransformer step, the categories are then only monitored with a training profile"""
+    column_transformer = next((step for _, step in model.steps[:-1] if isinstance(step, ColumnTransformer)), None)
+    if column_transformer is None:
+        return {}
+
+    levels = {}
+    for _, transformer, columns in column_transformer.transformers_:
+        if hasattr(transformer, 'categories_'):
+            levels.update({col: list(categories) for col, categories in zip(columns, transformer.categories_)})
+
+    return levels
+
+
+def _frequencies(counts):
+    total = counts.sum()
+    return counts / total if total else np.zeros(len(counts))
+
+
+def _psi(actual_counts, expected_counts):
+    if actual_counts.sum() == 0:
+        return None
+    actual, expected = _frequencies(actual_counts) + PSI_EPSILON, _frequencies(expected_counts) + PSI_EPSILON
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def _total_variation(actual_counts, expected_counts):
+    if actual_counts.sum() == 0:
+        return None
+    return float(np.abs(_frequencies(actual_counts) - _frequencies(expected_counts)).sum() / 2)
+
+
+def _ks_statistic(actual_counts, expected_counts):
+    if actual_counts.sum() == 0:
+        return None
+    return float(np.abs(np.cumsum(_frequencies(actual_counts)) - np.cumsum(_frequencies(expected_counts))).max())
+
+
+if __name__ == '__main__':
+    # Create the training profile from the training features, with the predictions of the deployed model
+    import pickle
+
+    with open('../models/salary_prediction_xgboost_v1.pkl', 'rb') as model_file:
+        deployed_model = pickle.load(model_file)
+
+    train_path, output_path = sys.argv[1], sys.argv[2]
+    train = pd.read_parquet(train_path) if train_path.endswith('.parquet') else pd.read_csv(train_path)
+    features = train[['jobType', 'degree', 'major', 'industry', 'yearsExperience', 'milesFromMetropolis']]
+
+    training_profile = make_profile(features, deployed_model.predict(features), _model_category_levels(deployed_model))
+    with open(output_path, 'w') as profile_file:
+        json.dump(training_profile, profile_file)
+
+    print(f"Saved the training profile of {len(train)} rows to {output_path}")
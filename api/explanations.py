@@ -0,0 +1,158 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder
+
+# Input columns of the model pipeline, in the order it was trained with
+FEATURE_COLUMNS = ['jobType', 'degree', 'major', 'industry', 'yearsExperience', 'milesFromMetropolis']
+CATEGORY_COLUMNS = FEATURE_COLUMNS[:4]
+
+# Every value of the numeric features, used to precompute a full table for a category combination
+NUMERIC_RANGES = {'yearsExperience': 25, 'milesFromMetropolis': 100}
+
+
+class ContributionCache:
+    def __init__(self, model, max_size = 100_000, exact = False):
+        """
+        Per-feature contributions to the predictions of the model pipeline, from XGBoost's pred_contribs.
+
+        By default the contributions follow the decision path of each tree (approx_contribs, the changes in the expected
+        value of the tree at every split along the path), which costs about as much as predicting. With 'exact' they are
+        SHAP values, which are 100x slower and best used with precompute().
+
+        Every batch of rows is explained with a single call: rows that were explained before are read from the cache,
+        and the rest are transformed and explained together, at about the cost of one batched predict.
+
+        Two caches are used, both keyed by the feature values of a row:
+        - precomputed tables: for a combination of the category features, the contributions of every value of the
+          numeric features (25 x 100 rows), see precompute()
+        - a least recently used cache of up to 'max_size' rows for everything else
+
+        The contributions of a row sum to its predicted salary, the 'bias' is the part shared by every prediction.
+
+        The contributions of the one hot columns of a feature are added up into the contribution of that feature.
+
+        Raises a ValueError for pipelines whose preprocessing isn't only a ColumnTransformer (i.e. with a
+        GroupTargetEncoder step), or whose encoded columns can't be mapped back to a single input column each.
+        """
+        self.output_features = _output_feature_names(model)
+        if self.output_features is None:
+            raise ValueError("Explanations need a pipeline with a ColumnTransformer as its only preprocessing step")
+
+        self.preprocessing = model[:-1]
+        self.booster = model[-1].get_booster()
+
+        # Any other transformer than the ordinal, one hot and scaling ones would shift every column after it
+        if len(self.output_features) != self.booster.num_features():
+            raise ValueError(
+                f"The model has {self.booster.num_features()} features but {len(self.output_features)} encoded columns "
+                f"were mapped to input columns, the preprocessing has a transformer that isn't supported"
+            )
+        unknown = set(self.output_features) - set(FEATURE_COLUMNS)
+        if unknown:
+            raise ValueError(f"The encoded columns of {sorted(unknown)} are not input columns of the API")
+
+        # Sums the contributions of the encoded columns (and the bias) into the input columns, in the input order
+        self._to_inputs = np.zeros((len(self.output_features) + 1, len(FEATURE_COLUMNS) + 1), dtype = np.float32)
+        self._to_inputs[np.arange(len(self.output_features)), [FEATURE_COLUMNS.index(col) for col in self.output_features]] = 1
+        self._to_inputs[-1, -1] = 1
+        self.max_size = max_size
+        self.exact = exact
+
+        self._tables = {}
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def explain(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Contributions of each feature for every row of 'data', a dataframe with one column per feature and a 'bias' column"""
+        data = data[FEATURE_COLUMNS]
+        keys = list(data.itertuples(index = False, name = None))
+        contributions = np.empty((len(keys), len(FEATURE_COLUMNS) + 1), dtype = np.float32)
+
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._lookup(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    contributions[i] = cached
+
+        if missing:
+            contributions[missing] = self._contributions(data.iloc[missing])
+            with self._lock:
+                for i in missing:
+                    self._store(keys[i], contributions[i])
+
+        return pd.DataFrame(contributions, columns = FEATURE_COLUMNS + ['bias'], index = data.index)
+
+    def precompute(self, category_combinations):
+        """Compute the contributions of every numeric value for each combination of the category features
+
+        category_combinations : list of (jobType, degree, major, industry) tuples, i.e. the most common ones in the training data
+        """
+        numeric_grid = np.stack(np.meshgrid(*[np.arange(size) for size in NUMERIC_RANGES.values()], indexing = 'ij'), axis = -1).reshape(-1, 2)
+
+        for combination in category_combinations:
+            grid = pd.DataFrame({
+                **dict(zip(CATEGORY_COLUMNS, combination)),
+                **{col: numeric_grid[:, i] for i, col in enumerate(NUMERIC_RANGES)}
+            }, columns = FEATURE_COLUMNS)
+
+            table = self._contributions(grid).reshape(*NUMERIC_RANGES.values(), -1)
+            with self._lock:
+                self._tables[tuple(combination)] = table
+
+    def _contributions(self, data):
+        """Batched contributions of the input columns, the encoded columns are added up into their input column"""
+        contribs = self.booster.predict(xgb.DMatrix(self.preprocessing.transform(data)), pred_contribs = True, approx_contribs = not self.exact)
+
+        return contribs @ self._to_inputs
+
+    def _lookup(self, key):
+        table = self._tables.get(key[:4])
+        if table is not None:
+            years, miles = key[4:]
+            if years == int(years) and miles == int(miles) and 0 <= years < table.shape[0] and 0 <= miles < table.shape[1]:
+                return table[int(years), int(miles)]
+
+        cached = self._rows.get(key)
+        if cached is not None:
+            self._rows.move_to_end(key)
+
+        return cached
+
+    def _store(self, key, contributions):
+        self._rows[key] = contributions.copy()
+        if len(self._rows) > self.max_size:
+            self._rows.popitem(last = False)
+
+
+def _output_feature_names(model):
+    """Input column behind each output column of the pipeline's fitted ColumnTransformer: one output per level for
+    one hot encoded columns and one output per column for every other transformer.
+    None when the ColumnTransformer isn't the only preprocessing step, since its input columns aren't the request's columns"""
+    preprocessing = [step for _, step in model.steps[:-1]]
+    if len(preprocessing) != 1 or not isinstance(preprocessing[0], ColumnTransformer):
+        return None
+
+    column_transformer = preprocessing[0]
+    names = []
+    for _, transformer, columns in column_transformer.transformers_:
+        if transformer == 'drop':
+            continue
+        # The remainder is given as column positions of the fitted data
+        columns = [FEATURE_COLUMNS[col] if isinstance(col, (int, np.integer)) else col for col in columns]
+        if isinstance(transformer, OneHotEncoder):
+            dropped = getattr(transformer, 'drop_idx_', None)
+            for i, (col, levels) in enumerate(zip(columns, transformer.categories_)):
+                n_outputs = len(levels) - (1 if dropped is not None and dropped[i] is not None else 0)
+                names.extend([col] * n_outputs)
+        else:
+            names.extend(columns)
+
+    return names
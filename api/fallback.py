@@ -0,0 +1,112 @@
+import time
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+
+class LookupTableModel:
+    def __init__(self, path):
+        """
+        BaselineModel compiled into arrays with BaselineModel().compile_lookup_table(), used as a fallback for the XGBoost model.
+
+        Predicting is one array gather for the category combination and one per numeric variable, so it serves many
+        more rows per second than the XGBoost pipeline (at the accuracy of the baseline model).
+        """
+        with np.load(path) as table:
+            self.category_vars = table['category_vars'].tolist()
+            self.category_table = table['category_table']
+            self.numeric_vars = table['numeric_vars'].tolist()
+            self.numeric_combo = str(table['numeric_combo'])
+            self.fill_value = float(table['fill_value'])
+            self.levels = {col: pd.Index(table[f'levels_{col}']) for col in self.category_vars}
+            self.diffs = {col: table[f'diffs_{col}'] for col in self.numeric_vars}
+            self.offsets = {col: int(table[f'offset_{col}']) for col in self.numeric_vars}
+
+    def predict(self, data: pd.DataFrame) -> np.ndarray:
+        codes = [self.levels[col].get_indexer(data[col].astype(str)) for col in self.category_vars]
+        known = np.logical_and.reduce([code >= 0 for code in codes])
+
+        flat_index = np.ravel_multi_index([np.maximum(code, 0) for code in codes], self.category_table.shape)
+        predictions = np.where(known, self.category_table.ravel()[flat_index], self.fill_value).astype(np.float64)
+
+        if self.numeric_vars:
+            numeric_diffs = np.zeros(len(data), dtype = np.float64)
+            for col in self.numeric_vars:
+                # Values outside of the fitted range have a difference of 0
+                positions = data[col].to_numpy().astype(np.int64) - self.offsets[col]
+                in_range = (positions >= 0) & (positions < len(self.diffs[col]))
+                numeric_diffs += np.where(in_range, self.diffs[col][np.clip(positions, 0, len(self.diffs[col]) - 1)], 0)
+
+            if self.numeric_combo == 'mean':
+                numeric_diffs /= len(self.numeric_vars)
+            predictions += numeric_diffs
+
+        return predictions
+
+
+class LoadShedder:
+    def __init__(self, max_in_flight = 8, max_latency_ms = 500, probe_interval = 1.0, smoothing = 0.2):
+        """
+        Decides whether a request is served by the main model or the fallback model.
+
+        Requests go to the fallback while the number of requests being predicted by the main model (the queue in
+        front of it) is at 'max_in_flight', or while their expected latency is above 'max_latency_ms'.
+
+        The latency is tracked per row, with a moving average for each kind of request (i.e. one per endpoint, since
+        a batch has a much lower latency per row than a single row), and the expected latency of a request is that
+        average times its number of rows. So a large batch only raises the expected latency of other large batches,
+        small requests keep being served by the main model.
+
+        While shedding because of latency, one request of the kind every 'probe_interval' seconds still goes to the
+        main model, so the average latency is updated and the main model is used again once it recovers.
+
+        Parameters
+        ----------
+
+        max_in_flight : Maximum number of concurrent requests predicted by the main model
+        max_latency_ms : Maximum expected latency of a request to the main model, in milliseconds
+        probe_interval : Seconds between requests sent to the main model while shedding because of latency
+        smoothing : Weight of the newest latency in the exponential moving averages
+        """
+        self.max_in_flight = max_in_flight
+        self.max_latency_ms = max_latency_ms
+        self.probe_interval = probe_interval
+        self.smoothing = smoothing
+
+        self.in_flight = 0
+        self.latency_ms_per_row = {}
+        self.shed_requests = 0
+        self._last_probe = {}
+        self._lock = threading.Lock()
+
+    def use_fallback(self, kind = 'single', n_rows = 1) -> bool:
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.shed_requests += 1
+                return True
+
+            if self.latency_ms_per_row.get(kind, 0.0) * n_rows > self.max_latency_ms:
+                now = time.monotonic()
+                if now - self._last_probe.get(kind, 0.0) < self.probe_interval:
+                    self.shed_requests += 1
+                    return True
+                self._last_probe[kind] = now
+
+            return False
+
+    @contextmanager
+    def track(self, kind = 'single', n_rows = 1):
+        """Count a request to the main model as in flight and add its latency per row to the moving average of its kind"""
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000 / max(n_rows, 1)
+            with self._lock:
+                self.in_flight -= 1
+                average = self.latency_ms_per_row.get(kind, 0.0)
+                self.latency_ms_per_row[kind] = average + self.smoothing * (latency_ms - average)
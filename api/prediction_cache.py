@@ -0,0 +1,48 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from explanations import FEATURE_COLUMNS
+
+
+class PredictionCache:
+    def __init__(self, model, max_size = 100_000):
+        """
+        Predictions of the model pipeline, cached by the feature values of each row.
+
+        The front-end only sends the jobs that were added since its last submit, and rows that were already scored
+        (i.e. a resubmitted or duplicated job) are read from a least recently used cache of up to 'max_size' rows,
+        so only the rows that were never seen before are transformed and predicted, in a single batch.
+        """
+        self.model = model
+        self.max_size = max_size
+
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def predict(self, data: pd.DataFrame) -> np.ndarray:
+        data = data[FEATURE_COLUMNS]
+        keys = list(data.itertuples(index = False, name = None))
+        predictions = np.empty(len(keys), dtype = np.float64)
+
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._rows.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    predictions[i] = cached
+                    self._rows.move_to_end(key)
+
+        if missing:
+            predictions[missing] = self.model.predict(data.iloc[missing])
+            with self._lock:
+                for i in missing:
+                    self._rows[keys[i]] = predictions[i]
+                while len(self._rows) > self.max_size:
+                    self._rows.popitem(last = False)
+
+        return predictions
@@ -0,0 +1,99 @@
+"""
+Replay requests captured by request_capture.py against a running instance of the API, and compare the latencies.
+
+Requests are sent at their original arrival times (relative to the first request), divided by '--speed', from a pool of
+worker threads. The report has the latency percentiles of each endpoint as recorded by the server at capture time and
+as seen by the replay client (which includes the network and HTTP overhead).
+
+Usage (from the api directory):
+    python replay_capture.py <capture file or directory> [--url http://localhost:5000] [--speed 2.0] [--workers 16]
+"""
+import os
+import sys
+import time
+import argparse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from request_capture import read_capture
+
+PERCENTILES = [50, 95, 99]
+
+
+def load_requests(path):
+    """All the requests of a capture file, or of every capture file in a directory, sorted by arrival time"""
+    paths = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.bin')) if os.path.isdir(path) else [path]
+    requests = [record for capture_path in paths for record in read_capture(capture_path)]
+
+    return sorted(requests, key = lambda record: record[1])
+
+
+def replay(requests, url = 'http://localhost:5000', speed = 1.0, workers = 16, timeout = 30):
+    """Send the requests with their original spacing divided by 'speed' (0 sends them all at once)
+
+    Returns a dataframe with a row per request and the columns: endpoint, captured_latency_ms, replay_latency_ms, status
+    """
+    first_arrival = requests[0][1] if requests else 0
+    start = time.perf_counter()
+
+    def send(request):
+        endpoint, arrival_time, captured_latency_ms, payload = request
+        if speed > 0:
+            delay = (arrival_time - first_arrival) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+        http_request = urllib.request.Request(url + endpoint, data = payload, headers = {'Content-Type': 'application/json'})
+        sent = time.perf_counter()
+        try:
+            with urllib.request.urlopen(http_request, timeout = timeout) as response:
+                response.read()
+                status = response.status
+        except Exception as error:
+            status = getattr(error, 'code', 'error')
+
+        return endpoint, captured_latency_ms, (time.perf_counter() - sent) * 1000, status
+
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        results = list(executor.map(send, requests))
+
+    return pd.DataFrame(results, columns = ['endpoint', 'captured_latency_ms', 'replay_latency_ms', 'status'])
+
+
+def latency_report(results: pd.DataFrame) -> pd.DataFrame:
+    """Latency percentiles per endpoint at capture and replay time, and their differences"""
+    rows = {}
+    for endpoint, group in results.groupby('endpoint'):
+        row = {'requests': len(group), 'errors': int((group.status != 200).sum())}
+        for p in PERCENTILES:
+            captured, replayed = np.percentile(group.captured_latency_ms, p), np.percentile(group.replay_latency_ms, p)
+            row.update({f'captured_p{p}_ms': captured, f'replay_p{p}_ms': replayed, f'diff_p{p}_ms': replayed - captured})
+        rows[endpoint] = row
+
+    return pd.DataFrame(rows).T
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Replay captured requests against a running API and compare the latencies')
+    parser.add_argument('capture', help = 'Capture file, or directory of capture files')
+    parser.add_argument('--url', default = 'http://localhost:5000', help = 'Base URL of the API')
+    parser.add_argument('--speed', type = float, default = 1.0, help = 'Replay speed multiplier, 0 sends every request as fast as possible')
+    parser.add_argument('--workers', type = int, default = 16, help = 'Maximum number of concurrent requests')
+    parser.add_argument('--output', default = None, help = 'Optional CSV file for the latency of every request')
+    args = parser.parse_args(argv)
+
+    requests = load_requests(args.capture)
+    print(f"Replaying {len(requests)} requests at {args.speed}x speed against {args.url}")
+
+    results = replay(requests, url = args.url, speed = args.speed, workers = args.workers)
+    print(latency_report(results).to_string(float_format = '{:.1f}'.format))
+
+    if args.output:
+        results.to_csv(args.output, index = False)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
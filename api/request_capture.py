@@ -0,0 +1,127 @@
+"""
+Capture of the prediction requests into compact, append-only binary log files, to replay real traffic with replay_capture.py
+
+Each request is one record: a fixed size header (endpoint, arrival time, server latency, payload size) followed by the
+zlib compressed JSON payload. Requests are queued by the endpoints and written by a background thread; when the queue
+is full the request is dropped (and counted) instead of slowing the endpoint down. The file is flushed every time the
+queue is empty, so requests are on disk as soon as a burst is written, and the queue is drained and the file closed
+when the process exits. A new file is started when the current one reaches the maximum size.
+"""
+import atexit
+import os
+import sys
+import time
+import zlib
+import queue
+import struct
+import threading
+
+FILE_MAGIC = b'SALCAP1\n'
+
+# Endpoint code (uint8), arrival unix time (float64), server latency in ms (float32), compressed payload size (uint32)
+RECORD_HEADER = struct.Struct('<BdfI')
+
+ENDPOINTS = ['/single-prediction', '/multiple-prediction']
+
+
+class RequestCapture:
+    def __init__(self, directory, max_queue = 10_000, max_file_bytes = 64_000_000):
+        """
+        Parameters
+        ----------
+
+        directory : Directory to write the capture files to, named capture-<start time>-<number>.bin
+        max_queue : Maximum number of requests waiting to be written, requests are dropped when the queue is full
+        max_file_bytes : Size after which a new capture file is started
+        """
+        self.directory = directory
+        self.max_file_bytes = max_file_bytes
+        self.captured_requests = 0
+        self.dropped_requests = 0
+
+        os.makedirs(directory, exist_ok = True)
+        self._file = None
+        self._closed = False
+        self._file_number = 0
+        self._run_id = time.strftime('%Y%m%d-%H%M%S')
+        self._queue = queue.Queue(maxsize = max_queue)
+        self._thread = threading.Thread(target = self._run, name = 'request-capture', daemon = True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, endpoint, payload: bytes, arrival_time, latency_ms):
+        """Queue a request to be written, without waiting for it"""
+        if self._closed:
+            return
+
+        try:
+            self._queue.put_nowait((ENDPOINTS.index(endpoint), payload, arrival_time, latency_ms))
+        except queue.Full:
+            self.dropped_requests += 1
+
+    def flush(self):
+        """Block until every queued request is written"""
+        self._queue.join()
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """Write every queued request and close the current file, requests recorded afterwards are ignored"""
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while True:
+            endpoint_code, payload, arrival_time, latency_ms = self._queue.get()
+            try:
+                compressed = zlib.compress(payload)
+                self._current_file().write(RECORD_HEADER.pack(endpoint_code, arrival_time, latency_ms, len(compressed)) + compressed)
+                self.captured_requests += 1
+                if self._queue.empty():
+                    self._file.flush()
+            except Exception as error:
+                print(f"Request capture could not write a request: {error}", file = sys.stderr)
+            finally:
+                self._queue.task_done()
+
+    def _current_file(self):
+        if self._file is not None and self._file.tell() >= self.max_file_bytes:
+            self._file.close()
+            self._file = None
+
+        if self._file is None:
+            path = os.path.join(self.directory, f'capture-{self._run_id}-{self._file_number:04d}.bin')
+            self._file_number += 1
+            self._file = open(path, 'ab')
+            if self._file.tell() == 0:
+                self._file.write(FILE_MAGIC)
+
+        return self._file
+
+
+def read_capture(path):
+    """Yield (endpoint, arrival_time, latency_ms, payload bytes) for every request of a capture file
+
+    A record that was only partly written (i.e. the server was stopped while writing) ends the file.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a request capture file")
+
+        while True:
+            header = file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+
+            endpoint_code, arrival_time, latency_ms, size = RECORD_HEADER.unpack(header)
+            compressed = file.read(size)
+            if len(compressed) < size:
+                return
+
+            yield ENDPOINTS[endpoint_code], arrival_time, latency_ms, zlib.decompress(compressed)
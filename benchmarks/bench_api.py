@@ -0,0 +1,56 @@
+import sys
+import json
+
+from .common import make_data, load_flask_app
+
+
+def _request_jobs(n_jobs):
+    """Jobs in the JSON format sent by the front-end, with an 'id' for multi predict mode"""
+    features = make_data(n_rows = n_jobs).drop(columns = ['jobId', 'companyId', 'salary'])
+    jobs = json.loads(features.to_json(orient = 'records'))
+
+    return [dict(job, id = i) for i, job in enumerate(jobs)]
+
+
+class SinglePredictionSuite:
+    """The /single-prediction endpoint of api/app.py through the Flask test client"""
+
+    def setup(self):
+        self.client = load_flask_app().test_client()
+        self.job = _request_jobs(1)[0]
+        del self.job['id']
+
+    def time_single_prediction(self):
+        self.client.post('/single-prediction', json = self.job)
+
+
+class MultiplePredictionSuite:
+    """The /multiple-prediction endpoint of api/app.py through the Flask test client"""
+    params = [1, 100, 1000]
+    param_names = ['n_jobs']
+
+    def setup(self, n_jobs):
+        self.client = load_flask_app().test_client()
+        self.jobs = _request_jobs(n_jobs)
+
+    def time_multiple_prediction(self, n_jobs):
+        self.client.post('/multiple-prediction', json = self.jobs)
+
+    def peakmem_multiple_prediction(self, n_jobs):
+        self.client.post('/multiple-prediction', json = self.jobs)
+
+
+class ExplainPredictionSuite:
+    """The /explain-prediction endpoint of api/app.py, for a page of jobs explained for the first time"""
+    params = [1, 100]
+    param_names = ['n_jobs']
+
+    def setup(self, n_jobs):
+        self.client = load_flask_app().test_client()
+        self.jobs = [{key: value for key, value in job.items() if key != 'id'} for job in _request_jobs(n_jobs)]
+        self.explanations = sys.modules['app'].explanations
+
+    def time_explain_prediction(self, n_jobs):
+        # Clear the cache so every repeat explains the jobs instead of reading cached results
+        self.explanations._rows.clear()
+        self.client.post('/explain-prediction', json = self.jobs)
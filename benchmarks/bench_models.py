@@ -0,0 +1,177 @@
+import io
+from contextlib import redirect_stdout
+
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import OrdinalEncoder
+from xgboost.sklearn import XGBRegressor
+
+from src.data_store import CATEGORY_LEVELS, COLUMN_DTYPES
+from src.Baseline import BaselineModel, SelectBestModel
+from src.EvaluateModels import EvaluateEstimators
+from src.model_utils import make_categorical_encoding
+from src.target_encoding import GroupTargetEncoder
+
+from .common import make_data, make_features, load_deployed_model, load_fallback_model
+
+# setup_cache() runs in the benchmark directory, the compiled table is shared with the benchmark processes through this file
+FALLBACK_TABLE_PATH = 'salary_prediction_baseline.npz'
+
+
+class BaselineModelSuite:
+    """BaselineModel fit and predict, with the best configuration from the baseline notebook"""
+    timeout = 300
+
+    def setup(self):
+        self.data = make_data()
+        self.model = BaselineModel(['jobType', 'industry', 'degree', 'major'], ['yearsExperience', 'milesFromMetropolis'])
+        self.fitted_model = BaselineModel(['jobType', 'industry', 'degree', 'major'], ['yearsExperience', 'milesFromMetropolis'])
+        self.fitted_model.fit(self.data)
+
+    def time_fit(self):
+        self.model.fit(self.data)
+
+    def peakmem_fit(self):
+        self.model.fit(self.data)
+
+    def time_predict(self):
+        self.fitted_model.predict(self.data)
+
+    def peakmem_predict(self):
+        self.fitted_model.predict(self.data)
+
+
+class SelectBestModelSuite:
+    """SelectBestModel over a few category combinations and numeric variations"""
+    timeout = 600
+
+    def setup(self):
+        data = make_data()
+        # The test rows are also in the training data, so every category combination of the test set has a fitted
+        # value even for small benchmark sizes (BaselineModel predicts NaN for unseen combinations)
+        self.train_data, self.test_data = data, data.iloc[len(data) * 4 // 5:]
+        self.category_combos = [['jobType'], ['jobType', 'industry'], ['jobType', 'industry', 'degree', 'major']]
+        self.variations = {
+            'no_numeric': None,
+            'add_yearsExperience': 'yearsExperience',
+            'add_both': ['yearsExperience', 'milesFromMetropolis']
+        }
+
+    def time_select_best_model(self):
+        with redirect_stdout(io.StringIO()):
+            SelectBestModel(self.train_data, self.test_data, self.category_combos, self.variations, plot = False)
+
+    def peakmem_select_best_model(self):
+        with redirect_stdout(io.StringIO()):
+            SelectBestModel(self.train_data, self.test_data, self.category_combos, self.variations, plot = False)
+
+
+class EvaluateModelsSuite:
+    """EvaluateModels.run with a small hyperparameter grid"""
+    timeout = 900
+
+    def setup(self):
+        self.X, self.y = make_features()
+        self.preprocessing = ColumnTransformer([('ordinal encoding', OrdinalEncoder(), ['jobType', 'degree', 'industry', 'major'])], remainder = 'passthrough')
+        self.estimators = [
+            ('linear_regression', LinearRegression()),
+            ('xgb', XGBRegressor(n_estimators = 50, tree_method = 'hist'))
+        ]
+        self.tuning_parameters = {'xgb': {'xgb__max_depth': [3, 6]}}
+
+    def _run(self):
+        evaluator = EvaluateEstimators(self.estimators, self.preprocessing, scoring = 'neg_mean_squared_error', tuning_parameters = self.tuning_parameters)
+        with redirect_stdout(io.StringIO()):
+            evaluator.run(self.X, self.y)
+
+    def time_run(self):
+        self._run()
+
+    def peakmem_run(self):
+        self._run()
+
+
+class CategoricalEncodingSuite:
+    """Transform with a make_categorical_encoding() column transformer (ordinal, one hot and scaling),
+    or the CategoryCodeEncoder equivalent on object and categorical columns"""
+    params = ['column_transformer', 'codes_object', 'codes_categorical']
+    param_names = ['encoder']
+
+    def setup(self, encoder):
+        self.X, _ = make_features()
+        if encoder == 'codes_categorical':
+            self.X = self.X.astype({col: COLUMN_DTYPES[col] for col in CATEGORY_LEVELS})
+
+        self.encoding = make_categorical_encoding(
+            category_levels = [CATEGORY_LEVELS['jobType']],
+            ord_cols = ['jobType'],
+            oh_cols = ['degree', 'major', 'industry'],
+            use_codes = encoder != 'column_transformer'
+        ).fit(self.X)
+
+    def time_transform(self, encoder):
+        self.encoding.transform(self.X)
+
+    def peakmem_transform(self, encoder):
+        self.encoding.transform(self.X)
+
+
+class GroupTargetEncoderSuite:
+    """Out-of-fold group target features (fit_transform, as in cross validation) and the gather of transform()"""
+    params = [['mean'], ['mean', 0.25, 0.75]]
+    param_names = ['stats']
+
+    def setup(self, stats):
+        self.X, self.y = make_features()
+        self.encoder = GroupTargetEncoder([['jobType', 'industry'], ['jobType', 'degree', 'major', 'industry']], stats = stats)
+        self.encoder.fit(self.X, self.y)
+
+    def time_fit_transform(self, stats):
+        self.encoder.fit_transform(self.X, self.y)
+
+    def time_transform(self, stats):
+        self.encoder.transform(self.X)
+
+    def peakmem_fit_transform(self, stats):
+        self.encoder.fit_transform(self.X, self.y)
+
+
+class DeployedModelPredictSuite:
+    """Predictions with the deployed pipeline from ./models at several batch sizes"""
+    params = [1, 100, 10_000, 1_000_000]
+    param_names = ['batch_size']
+    timeout = 300
+
+    def setup_cache(self):
+        X, _ = make_features(n_rows = max(self.params))
+        return X
+
+    def setup(self, X, batch_size):
+        self.model = load_deployed_model()
+        self.batch = X.iloc[:batch_size]
+
+    def time_predict(self, X, batch_size):
+        self.model.predict(self.batch)
+
+    def peakmem_predict(self, X, batch_size):
+        self.model.predict(self.batch)
+
+
+class FallbackModelPredictSuite:
+    """Predictions with the compiled BaselineModel lookup table that api/app.py falls back to, at the batch sizes of DeployedModelPredictSuite"""
+    params = [1, 100, 10_000, 1_000_000]
+    param_names = ['batch_size']
+
+    def setup_cache(self):
+        data = make_data(n_rows = max(self.params))
+        model = BaselineModel(['jobType', 'industry', 'degree', 'major'], ['yearsExperience', 'milesFromMetropolis'])
+        model.fit(data)
+        model.compile_lookup_table(FALLBACK_TABLE_PATH)
+        return data
+
+    def setup(self, data, batch_size):
+        self.model = load_fallback_model(FALLBACK_TABLE_PATH)
+        self.batch = data.iloc[:batch_size]
+
+    def time_predict(self, data, batch_size):
+        self.model.predict(self.batch)
@@ -0,0 +1,71 @@
+import os
+import sys
+import pickle
+import importlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from src.data_store import CATEGORY_LEVELS, FEATURE_COLUMNS
+from src.synthetic_data import SalaryProfile
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+API_DIR = os.path.join(PROJECT_DIR, 'api')
+DEPLOYED_MODEL_PATH = os.path.join(PROJECT_DIR, 'models', 'salary_prediction_xgboost_v1.pkl')
+
+# Size of the synthetic dataset used by the benchmarks, i.e. SALARY_BENCHMARK_ROWS=1000000 asv run
+N_ROWS = int(os.getenv('SALARY_BENCHMARK_ROWS', 100_000))
+
+
+def make_data(n_rows = N_ROWS, seed = 0):
+    """Synthetic salary data with object dtype category columns, the same as loading the CSV files in the notebooks"""
+    data = SalaryProfile.default().sample(n_rows, np.random.default_rng(seed))
+    for col in ['companyId'] + list(CATEGORY_LEVELS):
+        data[col] = data[col].astype(str)
+
+    return data
+
+
+def make_features(n_rows = N_ROWS, seed = 0):
+    """Feature matrix and target vector in the format used for the ML models"""
+    data = make_data(n_rows, seed)
+    return data[FEATURE_COLUMNS], data['salary']
+
+
+def load_deployed_model():
+    """The pickled model from ./models, benchmarks are skipped (NotImplementedError) if it can't be loaded in this environment"""
+    try:
+        with open(DEPLOYED_MODEL_PATH, 'rb') as file:
+            return pickle.load(file)
+    except Exception as error:
+        raise NotImplementedError(f"Deployed model could not be loaded: {error}")
+
+
+def load_fallback_model(path):
+    """api/fallback.py's LookupTableModel for a table saved with BaselineModel().compile_lookup_table()"""
+    if API_DIR not in sys.path:
+        sys.path.insert(0, API_DIR)
+
+    return importlib.import_module('fallback').LookupTableModel(path)
+
+
+def load_flask_app():
+    """Import api/app.py, which loads the model from a path relative to the api directory"""
+    sys.path.insert(0, API_DIR)
+    with working_directory(API_DIR):
+        try:
+            app_module = importlib.import_module('app')
+        except Exception as error:
+            raise NotImplementedError(f"Flask app could not be loaded: {error}")
+
+    return app_module.app
+
+
+@contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
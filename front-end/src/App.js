@@ -37,8 +37,12 @@ class App extends React.Component {
             multiPredict: false,
             multiJobArray: [],
             // multiPredictValues is an object where keys are jobId's from the multiJobArray, and values are predicted salaries
-            multiPredictValues: {} 
+            multiPredictValues: {},
+            // number of jobs at the start of the multiJobArray that already have predictions
+            submittedJobs: 0
         };
+        // incremented when the job list is cleared, so responses to requests sent before clearing are ignored
+        this.jobListVersion = 0;
     };
     // handle changing tabs, this function is used in the InputsTab component
     changeTab = (event, newValue) => {
@@ -87,26 +91,39 @@ class App extends React.Component {
 
     };
 
-    // makes a post request for the jobs within the multiJobArray
+    // makes a post request for the jobs that were added to the multiJobArray since the last submit,
+    // the server only returns predictions for these jobs and they are merged with the previous predictions
     submitMultiPredictions = () => {
-        // If there is nothing in the multiJobArray, don't make the api request
-        if (this.state.multiJobArray.length === 0) {
+        let newJobs = this.state.multiJobArray.slice(this.state.submittedJobs);
+        // If there are no new jobs in the multiJobArray, don't make the api request
+        if (newJobs.length === 0) {
             return
         };
+        let submittedJobs = this.state.multiJobArray.length;
+        let jobListVersion = this.jobListVersion;
         // Setup POST request
         let requestOptions = {
             method: "POST",
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(this.state.multiJobArray)
+            body: JSON.stringify(newJobs)
         };
         // API call
         fetch('/multiple-prediction', requestOptions)
             .then(response => response.json())
-            .then(data => this.setState({multiPredictValues: data.message}))
+            .then(data => {
+                if (jobListVersion !== this.jobListVersion) {
+                    return
+                };
+                this.setState(state => ({
+                    multiPredictValues: Object.assign({}, state.multiPredictValues, data.message),
+                    submittedJobs: Math.max(state.submittedJobs, submittedJobs)
+                }));
+            })
     };
 
     clearMultiPredictions = () => {
-        this.setState({multiJobArray: [], multiPredictValues: {}});
+        this.jobListVersion += 1;
+        this.setState({multiJobArray: [], multiPredictValues: {}, submittedJobs: 0});
     };
 
     render() {
@@ -5,4 +5,12 @@ setup(
     name='src',
     packages=find_packages(),
     version='0.1.0',
-)
\ No newline at end of file
+    entry_points={
+        'console_scripts': [
+            'score-salaries=src.batch_scoring:main',
+            'generate-salary-data=src.synthetic_data:main',
+            'train-salary-model=src.streaming_training:main',
+            'compress-salary-model=src.model_compression:main',
+        ],
+    },
+)
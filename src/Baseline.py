@@ -1,4 +1,5 @@
 from sklearn.metrics import mean_squared_error
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -44,11 +45,11 @@ class BaselineModel:
         category_averages = salary_per_category_table(self.category_vars, data, target = self.target)
         self.fitted_category_salaries = category_averages.set_index(self.category_vars).rename(columns = {self.target: self.output_pred_col})
         
+        # Calculate the overall average salary
+        self.avg_salary_overall = data[self.target].mean()
+
         # If numeric variables are given, get grouped averages and subtract from overall salary mean
         if self.numeric_vars:
-            # Calculate the overall average salary
-            self.avg_salary_overall = data[self.target].mean()
-    
             for column in self.fitted_numeric_diffs.keys():
                 # Calculate the grouped average salary, and subtract the overall average salary from it
                 fitted_values = data.groupby(column)[self.target].mean() - self.avg_salary_overall
@@ -125,6 +126,57 @@ class BaselineModel:
         return {'training_error': train_error, 'test_error': test_error}
 
 
+    def compile_lookup_table(self, path = None, numeric_combo = "sum") -> dict:
+        """Export the fitted values as dense numpy arrays, so predicting is a single array lookup per variable.
+
+        The category averages become an array with one axis per category variable (in the order of their sorted levels),
+        and the numeric differences an array indexed by the numeric value minus its smallest fitted value. Category
+        combinations that were not in the training data get the overall average salary, unseen numeric values a difference of 0.
+        Used by the API as a fallback model, see api/fallback.py
+
+        path : Optional .npz file to save the arrays to
+        numeric_combo : How the numeric predictions are combined, one of: 'sum', 'mean' (see BaselineModel().predict())
+
+        Returns a dictionary of arrays
+        """
+        if not self.is_fitted:
+            raise ValueError("There are no fitted values, make a call to BaselineModel().fit() before compiling.")
+
+        if not numeric_combo in ["sum", "mean"]:
+            raise ValueError("The numeric_combo argument must be one of: 'sum', 'mean'")
+
+        category_salaries = self.fitted_category_salaries[self.output_pred_col]
+        index = category_salaries.index
+        levels = index.levels if isinstance(index, pd.MultiIndex) else [index]
+        codes = index.codes if isinstance(index, pd.MultiIndex) else [np.arange(len(index))]
+
+        category_table = np.full([len(level) for level in levels], self.avg_salary_overall, dtype = np.float32)
+        category_table[tuple(codes)] = category_salaries.to_numpy()
+
+        table = {
+            'category_vars': np.array(self.category_vars),
+            'category_table': category_table,
+            'numeric_vars': np.array(self.numeric_vars or [], dtype = str),
+            'numeric_combo': np.array(numeric_combo),
+            'fill_value': np.array(self.avg_salary_overall, dtype = np.float32)
+        }
+        for column, level in zip(self.category_vars, levels):
+            table[f'levels_{column}'] = np.asarray(level, dtype = str)
+
+        for column in self.numeric_vars or []:
+            diffs = self.fitted_numeric_diffs[column]
+            offset = int(diffs.index.min())
+            dense_diffs = np.zeros(int(diffs.index.max()) - offset + 1, dtype = np.float32)
+            dense_diffs[diffs.index.to_numpy().astype(int) - offset] = diffs.to_numpy()
+            table[f'diffs_{column}'] = dense_diffs
+            table[f'offset_{column}'] = np.array(offset)
+
+        if path:
+            np.savez(path, **table)
+
+        return table
+
+
     def _ensure_variables_in_data(self, new_columns):
         """Internal helper function to verify the presence of required columns.
         
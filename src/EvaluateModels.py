@@ -1,11 +1,29 @@
+import pickle
+import threading
+import time
+
 import pandas as pd
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 
 from IPython.display import display
+import psutil
+from sklearn.base import clone
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import cross_validate, GridSearchCV
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import cross_validate, GridSearchCV, KFold
+
+# Batch sizes used to measure prediction throughput when profiling models
+THROUGHPUT_BATCH_SIZES = (1, 100, 10_000)
+
+# Columns of 'test_results' that can be used as the cost axis of a pareto front plot
+PARETO_COSTS = {
+    'latency': 'single_row_latency_ms',
+    'size': 'model_size_mb',
+    'fit_time': 'fit_time',
+    'memory': 'peak_fit_memory_mb'
+}
 
 class EvaluateModels:
     def __init__(self, test_models: list, constant_model, test_type, scoring, tuning_parameters = {}):
@@ -31,6 +49,7 @@ class EvaluateModels:
         
         # variables to be filled in during evaluation process
         self.test_results = None
+        self.fold_results = {}
         self.best_model = None
         self.best_score = None
         
@@ -59,7 +78,7 @@ class EvaluateModels:
             
         return mdl_pipeline
     
-    def run(self, X, y, verbose = False):
+    def run(self, X, y, verbose = False, profile = False, batch_sizes = THROUGHPUT_BATCH_SIZES):
         """
         Evaluate each model in the test_models attribute, compute cross validated scores and save resutls to a table
         
@@ -68,6 +87,9 @@ class EvaluateModels:
         X: The feature matrix of a dataset to be used in cross validation
         y: Target vector corresponding to the feature matrix X
         verbose: Boolean; print the progress and scores during evaluation
+        profile: Boolean; also record peak fit memory, serialized model size, single row latency and
+            batch prediction throughput for each model. Per-fold values are kept in the 'fold_results' attribute
+        batch_sizes: Batch sizes (number of rows) used to measure prediction throughput when profiling
         """
         
         cv_results = []
@@ -90,12 +112,21 @@ class EvaluateModels:
                 model = self.tune_parameters(model, X, y, name = model_test[0]) 
             
             # Compute cross validation scores
-            cv_values = cross_validate(model, X, y = y, scoring = self.scoring, cv = 5, return_train_score = True)
+            if profile:
+                cv_values, fitted_model = self.profile_cross_validate(model, X, y)
+            else:
+                cv_values = cross_validate(model, X, y = y, scoring = self.scoring, cv = 5, return_train_score = True)
+            
+            self.fold_results[model_test[0]] = pd.DataFrame(cv_values).rename_axis('fold')
             
             # Append results to dataframe list - cv_values is a dictionary of arrays
             # so this dictionary comprehension computes the mean of each array and saves a new dictionary
             scores = {name:np.mean(value) for name, value in cv_values.items()}
             
+            if profile:
+                scores['fit_time_std'] = np.std(cv_values['fit_time'])
+                scores.update(EvaluateModels.profile_inference(fitted_model, X, batch_sizes = batch_sizes))
+            
             cv_results.append(scores)
             cv_index.append(model_test[0])
             
@@ -113,10 +144,16 @@ class EvaluateModels:
                 EvaluateModels.print_progress(model_name = model_test[0], metrics = scores) 
             
         # Make output dataframe sorted by test score in descending order
+        result_columns = ['test_score', 'train_score', 'fit_time', 'score_time']
+        
+        if profile:
+            result_columns.extend(['fit_time_std', 'peak_fit_memory_mb', 'model_size_mb', 'single_row_latency_ms'])
+            result_columns.extend([f'throughput_{size}' for size in batch_sizes])
+        
         self.test_results = (
             pd.DataFrame(data = cv_results, index = cv_index)
             .sort_values('test_score', ascending = False)
-            .reindex(columns = ['test_score', 'train_score', 'fit_time', 'score_time'])
+            .reindex(columns = result_columns)
         )
         
         # print end results
@@ -127,6 +164,74 @@ class EvaluateModels:
         print(self.best_score, end = '\n\n')
         display(self.test_results)
 
+    def profile_cross_validate(self, model, X, y, cv = 5):
+        """Cross validate a model while recording the fit time and peak memory of each fold.
+        
+        Uses the same unshuffled KFold splits as cross_validate() does for regressors, so the scores are comparable
+        with the ones from a regular run. Peak memory is the largest increase of the process' resident memory (RSS) during
+        the fit, sampled by a background thread, so it includes memory allocated by compiled libraries (e.g. the xgboost
+        booster) as well as numpy and pandas. Memory the process already held and reuses doesn't count, so the values
+        are best compared between models profiled in the same session.
+        
+        Returns a tuple of (dictionary of per fold arrays, the estimator fitted on the last fold)
+        """
+        scorer = check_scoring(model, scoring = self.scoring)
+        fold_values = {name: [] for name in ['fit_time', 'score_time', 'test_score', 'train_score', 'peak_fit_memory_mb']}
+        
+        for train_idx, test_idx in KFold(n_splits = cv).split(X, y):
+            X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+            y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
+            fold_model = clone(model)
+            
+            with _PeakRSS() as peak_rss:
+                start = time.perf_counter()
+                fold_model.fit(X_train, y_train)
+                fold_values['fit_time'].append(time.perf_counter() - start)
+            fold_values['peak_fit_memory_mb'].append(peak_rss.increase / 1e6)
+            
+            start = time.perf_counter()
+            fold_values['test_score'].append(scorer(fold_model, X_test, y_test))
+            fold_values['score_time'].append(time.perf_counter() - start)
+            fold_values['train_score'].append(scorer(fold_model, X_train, y_train))
+        
+        return {name: np.array(values) for name, values in fold_values.items()}, fold_model
+    
+    @staticmethod
+    def profile_inference(model, X, batch_sizes = THROUGHPUT_BATCH_SIZES, n_repeats = 50):
+        """Measure the inference cost of a fitted model.
+        
+        Parameters
+        ----------
+        
+        model : A fitted estimator or pipeline
+        X : Feature matrix to draw prediction rows from
+        batch_sizes : Batch sizes to measure throughput (rows per second) for; sizes larger than X are skipped
+        n_repeats : Number of single row predictions used for the median latency
+        
+        Returns a dictionary with the serialized model size, the median single row latency and a throughput value per
+        measured batch size
+        """
+        profile = {'model_size_mb': len(pickle.dumps(model)) / 1e6}
+        
+        # Median latency of predicting one row at a time
+        latencies = []
+        for i in range(min(n_repeats, len(X))):
+            row = X.iloc[[i]]
+            start = time.perf_counter()
+            model.predict(row)
+            latencies.append(time.perf_counter() - start)
+        profile['single_row_latency_ms'] = np.median(latencies) * 1000
+        
+        for size in batch_sizes:
+            if size > len(X):
+                continue
+            batch = X.iloc[:size]
+            start = time.perf_counter()
+            model.predict(batch)
+            profile[f'throughput_{size}'] = len(batch) / (time.perf_counter() - start)
+        
+        return profile
+
     def tune_parameters(self, model, X, y, name):
         """Perform hyperparameter tuning and return the model after setting params to the best found.
         
@@ -161,8 +266,16 @@ class EvaluateModels:
         print(f"Test score  : {metrics['test_score']}")
         print(f"Train score : {metrics['train_score']}", end = '\n\n')
 
-    def plot_results(self, best_score = None):
-        """Plot the results of an evaluation test"""
+    def plot_results(self, best_score = None, pareto_cost = None):
+        """Plot the results of an evaluation test
+        
+        Parameters
+        ----------
+        
+        best_score : Adds a reference line for a previous best score
+        pareto_cost : {'latency', 'size', 'fit_time', 'memory'} or None. When given, plot the test score against
+            this cost and highlight the pareto front instead of the bar plot. Requires 'run(profile = True)'
+        """
         
         # check to see if all the scores are negative (using a negative scoring metric in sklearn)
         # if so, change it to the absolute value
@@ -171,11 +284,52 @@ class EvaluateModels:
         else:
             scores = self.test_results.test_score
         
+        if pareto_cost:
+            return self._plot_pareto_front(scores, pareto_cost, best_score = best_score)
+        
         sns.barplot(x = scores, y = self.test_results.index, orient = 'h', color = 'lightblue')
         
         if best_score:
             plt.axvline(x = best_score, linestyle = '--', color = 'black', label = f'Best score: {round(best_score, 2)}')
             plt.legend(bbox_to_anchor = (1,1))
+
+    def _plot_pareto_front(self, scores, pareto_cost, best_score = None):
+        """Scatter plot of score vs cost with the pareto optimal models connected by a step line"""
+        
+        if not pareto_cost in PARETO_COSTS:
+            raise ValueError(f"The 'pareto_cost' argument must be one of: {', '.join(PARETO_COSTS)}")
+        
+        cost_col = PARETO_COSTS[pareto_cost]
+        if self.test_results[cost_col].isna().all():
+            raise ValueError("No profiling results found, use EvaluateModels().run(profile = True) before plotting a pareto front")
+        
+        # Lower is better for both axes when the scores have been converted to errors, otherwise higher scores are better
+        errors_are_scores = all(self.test_results.test_score.lt(0))
+        plot_df = pd.DataFrame({'cost': self.test_results[cost_col], 'score': scores}).sort_values(['cost', 'score'], ascending = [True, errors_are_scores])
+        
+        # A model is on the pareto front if no cheaper model has a better score
+        if errors_are_scores:
+            plot_df['pareto'] = plot_df.score < plot_df.score.cummin().shift(fill_value = np.inf)
+        else:
+            plot_df['pareto'] = plot_df.score > plot_df.score.cummax().shift(fill_value = -np.inf)
+        
+        front = plot_df.loc[plot_df.pareto]
+        
+        plt.scatter(plot_df.cost, plot_df.score, color = 'lightblue', edgecolor = 'grey')
+        plt.step(front.cost, front.score, where = 'post', color = 'red', label = 'Pareto front')
+        plt.scatter(front.cost, front.score, color = 'red')
+        
+        for name, row in plot_df.iterrows():
+            plt.annotate(name, (row.cost, row.score), textcoords = 'offset points', xytext = (5, 5), fontsize = 8)
+        
+        if best_score:
+            plt.axhline(y = best_score, linestyle = '--', color = 'black', label = f'Best score: {round(best_score, 2)}')
+        
+        plt.xlabel(cost_col)
+        plt.ylabel(f'test score ({self.scoring})')
+        plt.legend(bbox_to_anchor = (1,1))
+        
+        return front
     
     
 class EvaluatePreprocessors(EvaluateModels):
@@ -209,3 +363,31 @@ class EvaluatePipelines(EvaluateModels):
         
         """
         super().__init__(test_models = pipelines, constant_model = None, test_type = 'pipeline', scoring = scoring, **kwargs)
+
+
+class _PeakRSS:
+    """Context manager recording the largest increase of the process' RSS (in bytes) over its value on entering
+
+    RSS is polled every 'interval' seconds by a daemon thread, so a spike shorter than that can be missed.
+    """
+    def __init__(self, interval = 0.005):
+        self.interval = interval
+        self.increase = 0
+        self._process = psutil.Process()
+        self._done = threading.Event()
+
+    def __enter__(self):
+        self._start = self._peak = self._process.memory_info().rss
+        self._thread = threading.Thread(target = self._poll, daemon = True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._thread.join()
+        self._peak = max(self._peak, self._process.memory_info().rss)
+        self.increase = self._peak - self._start
+
+    def _poll(self):
+        while not self._done.wait(self.interval):
+            self._peak = max(self._peak, self._process.memory_info().rss)
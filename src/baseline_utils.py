@@ -1,9 +1,9 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import numpy as np
-from statsmodels.nonparametric.smoothers_lowess import lowess
-from siuba import _, group_by, summarize, mutate, ungroup
+
+from src.residual_utils import ResidualDiagnostics
+from src.error_slices import ErrorSlices
 
 from warnings import filterwarnings
 
@@ -107,10 +107,11 @@ def get_residuals(data: pd.DataFrame, add_to_df = False) -> pd.DataFrame:
     return data
 
 
-def describe_residuals(resids: pd.DataFrame):
+def describe_residuals(resids: pd.DataFrame, n_bins = 100):
     """Prints out and reports summary statistics on the residuals.
     
-    Meant to work with the output of 'get_residuals()' function
+    Meant to work with the output of 'get_residuals()' function.
+    The plots are drawn from binned aggregates (see ResidualDiagnostics), so this scales to millions of rows.
     """
     print("Residual info")
     print("-"*20)
@@ -118,83 +119,31 @@ def describe_residuals(resids: pd.DataFrame):
     print("Summary Stats:")
     print(resids.final_residuals.describe(), end = '\n\n')
     
-    # Setup, figure, grid, and axes objects
-    fig, ax = plt.subplots(2,2, figsize=(10, 7), gridspec_kw = {'height_ratios': [2,3]})
-    grid_shape = (2,2)
-    resid_v_fitted = plt.subplot2grid(grid_shape, (0,0))
-    scale_location = plt.subplot2grid(grid_shape, (0,1))
-    resid_distn = plt.subplot2grid(grid_shape, (1,0), colspan = 2)
-    
-    # Residuals vs fitted
-    sns.scatterplot(x = 'salary_preds', y = 'final_residuals', data = resids, alpha = 0.2, color = 'grey', ax = resid_v_fitted)
-    resid_v_fitted.axhline(resids.final_residuals.mean(), color = 'blue')
-    resid_v_fitted.set_xlabel('Fitted Values')
-    resid_v_fitted.set_ylabel('Residuals')
-    resid_v_fitted.set_title('Residuals vs fitted')
-    
-    # Scale-Location
-    # standardize residuals
-    std_resids = (resids.final_residuals - resids.final_residuals.mean()) / resids.final_residuals.std()
-    std_resids = np.sqrt(std_resids.abs())
-    # fit loess curve
-    delta = 0.00005 * len(resids) # For computational efficiency, with lowess, on large data 
-    loess = lowess(std_resids, resids.salary_preds, it = 0, delta = delta, return_sorted = False)
-    # plot
-    sns.scatterplot(x = resids.salary_preds, y = std_resids, alpha = 0.2, color = 'grey', ax = scale_location)
-    sns.lineplot(x = resids.salary_preds, y = loess, ci = None, color = "blue", ax = scale_location)
-    
-    scale_location.set_ylabel('$\sqrt{|Standardized Residuals|}$')
-    scale_location.set_xlabel('Fitted Values')
-    scale_location.set_title('Scale-Location')
-    
-    # Residual distribution
-    sns.histplot(x = 'final_residuals', data = resids, ax = resid_distn, color = 'grey')
-    resid_distn.set_title('Distribution')
-    resid_distn.set_ylabel('')
-    resid_distn.set_xlabel('Residuals')
-    
-    plt.tight_layout()
-    plt.show()
+    ResidualDiagnostics(resids.salary_preds, resids.final_residuals, n_bins = n_bins).plot()
     
 def plot_large_error_percentage(data, threshold):
     """
     calculate overall high error percentage based on 2 std devations from the mean 
         abs(resid_mean - resid) > 2 * resid.std()
         
-    gather long form data of the columns, filter to only large errors and their percentages
+    compute the large error percentage of every level of each column with ErrorSlices, which also
+    ranks pairs of columns (see ErrorSlices().worst_slices())
     
     setup facet grid and pass in axes plotting function
     """
-    resid_mean = data.final_residuals.mean()
-    
-    # Calculate distance from average and apply a threshold to indicate large errors
-    data['high_error'] = (resid_mean - data.final_residuals).abs() > threshold
+    error_slices = ErrorSlices(data, threshold, pairs = False)
     
     # Percentage of large errors in the overall data set
-    overall_large_error_percent = data.high_error.mean()
-    
-    # long form plotting data
-    # Use siuba library to help with R/dplyr style aggregations
-    data_melted = (data
-     .loc[:, ['jobType', 'industry', 'degree', 'major', 'milesFromMetropolis', 'yearsExperience', 'high_error']]
-     .melt(id_vars = 'high_error', var_name = 'column')
-     >> group_by('column', 'value', 'high_error')
-     >> summarize(total = _.value_counts())
-     >> group_by('column', 'value')
-     >> mutate(percent = _.total / _.total.sum())
-     >> ungroup()
-    )
+    overall_large_error_percent = error_slices.overall_large_error_rate
     
-    # Filter for only large error percentages and apply a grouped sort to prepare for plotting
-    data_melted = (data_melted
-                   .loc[data_melted.high_error, :]
-                   .groupby('column')
-                   .apply(lambda x: x.sort_values('percent', ascending = False))
-                   .reset_index(drop = True)
-                  )
+    # Sort within each column to prepare for plotting
+    plot_data = (error_slices
+                 .single_feature_table()
+                 .sort_values(['column', 'percent'], ascending = [True, False], ignore_index = True)
+                )
     
     plot_title = f"Percentage of large errors per category\nLarge error threshold = {round(threshold, 1)}"
-    plotGrid = sns.FacetGrid(data_melted, col = 'column', sharey = False, col_wrap=3, height = 4, aspect = 1.2)
+    plotGrid = sns.FacetGrid(plot_data, col = 'column', sharey = False, col_wrap=3, height = 4, aspect = 1.2)
     plotGrid.map(_large_error_axes_plot, 'percent', 'value', error_threshold = overall_large_error_percent)
     plotGrid.set_xlabels('Percentage of large errors')
     plotGrid.set_ylabels('')
@@ -0,0 +1,200 @@
+"""
+Offline batch scoring of large job extracts with the deployed model pipeline.
+
+The input is read in chunks, each chunk is a shard that gets scored by a pool of worker processes (each worker loads
+the pipeline once), and every scored shard is written to its own file in '<output>.shards/'. Shard files are written
+atomically, so an interrupted run can be resumed with '--resume' and only the missing shards are scored. The shard
+directory has a manifest of the run (input file, chunksize, model), a run with different settings is not resumed since
+its shards would cover different rows. Once every shard is complete they are combined into the output file.
+
+Usage (after 'pip install -e .'):
+    score-salaries <input.csv|input.parquet> <output.csv|output.parquet> [--workers N] [--chunksize ROWS] [--resume]
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.data_store import FEATURE_COLUMNS, read_chunks
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models', 'salary_prediction_xgboost_v1.pkl')
+
+PREDICTION_COL = 'salary_preds'
+
+MANIFEST_NAME = 'manifest.json'
+
+# Model loaded once per worker process by _init_worker()
+_worker_model = None
+
+
+def score_file(input_path, output_path, model_path = DEFAULT_MODEL_PATH, id_col = 'jobId', chunksize = 100_000,
+               workers = None, threads_per_worker = 1, resume = False, verbose = True):
+    """Score every row of a CSV or Parquet file and write the predictions with their ids to a CSV or Parquet file
+
+    Parameters
+    ----------
+    input_path : CSV or Parquet file with the id column and the model features
+    output_path : .csv or .parquet file to write the id column and the predictions to
+    model_path : Pickled model pipeline
+    id_col : Name of the id column copied to the output
+    chunksize : Number of rows per shard
+    workers : Number of worker processes, defaults to the number of CPUs
+    threads_per_worker : Threads used by the model within each worker
+    resume : Keep the shards completed by a previous run of the same input and only score the missing ones, raises a
+        ValueError if the previous run had a different input file, chunksize, id column or model
+    verbose : Print progress after every completed shard
+
+    Returns a dictionary with the number of rows scored, the elapsed seconds and the throughput in rows per second
+    """
+    shard_dir = output_path + '.shards'
+    manifest = _run_manifest(input_path, model_path, id_col, chunksize)
+    if resume and os.path.isdir(shard_dir):
+        _check_manifest(shard_dir, manifest)
+    else:
+        if os.path.isdir(shard_dir):
+            shutil.rmtree(shard_dir)
+        os.makedirs(shard_dir)
+        with open(os.path.join(shard_dir, MANIFEST_NAME), 'w') as file:
+            json.dump(manifest, file)
+
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    rows_scored = 0
+    pending = set()
+
+    with ProcessPoolExecutor(max_workers = workers, initializer = _init_worker, initargs = (model_path, threads_per_worker)) as executor:
+        for shard_id, chunk in enumerate(read_chunks(input_path, chunksize, columns = [id_col] + FEATURE_COLUMNS)):
+            if os.path.exists(_shard_path(shard_dir, shard_id)):
+                continue
+
+            # Bound the number of chunks held in memory while waiting for workers
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when = FIRST_COMPLETED)
+                rows_scored += _report_progress(done, rows_scored, start, verbose)
+
+            pending.add(executor.submit(_score_shard, chunk, id_col, _shard_path(shard_dir, shard_id)))
+
+        done, _ = wait(pending)
+        rows_scored += _report_progress(done, rows_scored, start, verbose)
+
+    _combine_shards(shard_dir, output_path)
+    shutil.rmtree(shard_dir)
+
+    elapsed = time.perf_counter() - start
+    summary = {'rows_scored': rows_scored, 'seconds': elapsed, 'rows_per_second': rows_scored / elapsed if elapsed else 0}
+
+    if verbose:
+        print(f"Scored {rows_scored} rows in {elapsed:.1f}s ({summary['rows_per_second']:.0f} rows/s), output: {output_path}")
+
+    return summary
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Batch score a CSV or Parquet file of jobs with the salary prediction model')
+    parser.add_argument('input', help = 'CSV or Parquet file with the id column and the model features')
+    parser.add_argument('output', help = 'Output .csv or .parquet file')
+    parser.add_argument('--model', default = DEFAULT_MODEL_PATH, help = 'Pickled model pipeline')
+    parser.add_argument('--id-col', default = 'jobId', help = 'Id column copied to the output')
+    parser.add_argument('--chunksize', type = int, default = 100_000, help = 'Rows per shard')
+    parser.add_argument('--workers', type = int, default = None, help = 'Worker processes, defaults to the number of CPUs')
+    parser.add_argument('--threads-per-worker', type = int, default = 1, help = 'Model threads within each worker')
+    parser.add_argument('--resume', action = 'store_true', help = 'Only score the shards missing from a previous run')
+    parser.add_argument('--quiet', action = 'store_true', help = 'Do not print progress')
+    args = parser.parse_args(argv)
+
+    score_file(args.input, args.output, model_path = args.model, id_col = args.id_col, chunksize = args.chunksize,
+               workers = args.workers, threads_per_worker = args.threads_per_worker, resume = args.resume, verbose = not args.quiet)
+
+
+def _init_worker(model_path, threads_per_worker):
+    global _worker_model
+
+    with open(model_path, 'rb') as file:
+        _worker_model = pickle.load(file)
+
+    # Avoid oversubscribing the CPUs, every worker would otherwise use the model's own n_jobs setting
+    final_step = _worker_model.steps[-1][1] if hasattr(_worker_model, 'steps') else _worker_model
+    if 'n_jobs' in final_step.get_params():
+        final_step.set_params(n_jobs = threads_per_worker)
+
+
+def _score_shard(chunk, id_col, shard_path):
+    """Score one chunk in a worker process and write it to its shard file, returns the number of rows"""
+    output = pd.DataFrame({
+        id_col: chunk[id_col].astype(str).to_numpy(),
+        PREDICTION_COL: _worker_model.predict(chunk[FEATURE_COLUMNS]).astype('float32')
+    })
+
+    # Write to a temporary file first, so a shard file only exists once it is complete
+    tmp_path = shard_path + '.tmp'
+    output.to_parquet(tmp_path, index = False)
+    os.replace(tmp_path, shard_path)
+
+    return len(output)
+
+
+def _report_progress(done, rows_scored, start, verbose):
+    new_rows = sum(future.result() for future in done)
+
+    if verbose and new_rows:
+        total = rows_scored + new_rows
+        elapsed = time.perf_counter() - start
+        print(f"Scored {total} rows, {total / elapsed:.0f} rows/s", flush = True)
+
+    return new_rows
+
+
+def _run_manifest(input_path, model_path, id_col, chunksize):
+    """Settings that decide which rows go in every shard and how they are scored"""
+    def file_info(path):
+        stat = os.stat(path)
+        return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    return {'input': file_info(input_path), 'model': file_info(model_path), 'id_col': id_col, 'chunksize': chunksize}
+
+
+def _check_manifest(shard_dir, manifest):
+    """Raise a ValueError if the shards in 'shard_dir' weren't written by a run with the same settings"""
+    manifest_path = os.path.join(shard_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"Cannot resume, {shard_dir} has no {MANIFEST_NAME} of the run that wrote it. Run again without resume")
+
+    with open(manifest_path) as file:
+        previous = json.load(file)
+
+    changed = [key for key in manifest if previous.get(key) != manifest[key]]
+    if changed:
+        raise ValueError(f"Cannot resume, the {', '.join(changed)} of the run that wrote {shard_dir} changed. Run again without resume")
+
+
+def _shard_path(shard_dir, shard_id):
+    return os.path.join(shard_dir, f'shard-{shard_id:06d}.parquet')
+
+
+def _combine_shards(shard_dir, output_path):
+    """Concatenate the shard files, in order, into the output file"""
+    shard_files = sorted(os.path.join(shard_dir, name) for name in os.listdir(shard_dir) if name.endswith('.parquet'))
+
+    if output_path.endswith('.parquet'):
+        writer = None
+        for shard_file in shard_files:
+            table = pq.read_table(shard_file)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is not None:
+            writer.close()
+    else:
+        for i, shard_file in enumerate(shard_files):
+            pd.read_parquet(shard_file).to_csv(output_path, mode = 'w' if i == 0 else 'a', header = i == 0, index = False)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
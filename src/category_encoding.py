@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils.validation import check_is_fitted
+
+
+class CategoryCodeEncoder(BaseEstimator, TransformerMixin):
+    def __init__(self, category_levels = None, ord_cols = None, oh_cols = None, scaling_cols = None,
+                 dtype = np.float32, output = 'auto', sparse_threshold = 0.3):
+        """
+        Drop-in replacement for the column transformer of make_categorical_encoding(), that encodes integer category codes.
+
+        Every categorical column is converted to integer codes of a fixed vocabulary once per transform: pandas
+        Categorical columns are re-mapped through a small lookup array of their categories, other columns are coded
+        with a single vectorized pd.Categorical() call. The ordinal features are the codes themselves and the one hot
+        features are scattered from the codes, so there are no row by row string comparisons and no float64 copies.
+
+        The output columns are in the same order as make_categorical_encoding(): ordinal columns, one hot columns (levels
+        sorted like OneHotEncoder), scaled columns, then the remaining columns passed through in their original order.
+
+        Columns loaded with load_dataset() are already Categorical with the CATEGORY_LEVELS vocabularies, which is the
+        fastest input. A pipeline pickled with this encoder needs the src package installed wherever it is loaded.
+
+        Parameters
+        ----------
+
+        category_levels : (list or None) Ordinal levels for each of the ord_cols, the code of a value is its position
+        ord_cols : (list or None) The columns to perform ordinal encoding
+        oh_cols : (list or None) The columns to perform one hot encoding, their levels are the sorted values seen in fit()
+        scaling_cols : (list or None) Numeric columns to standardize
+        dtype : dtype of the output, an integer dtype (i.e. np.uint8) can only be used for ordinal and one hot features,
+            without scaling_cols or remaining columns, fit() raises a ValueError otherwise
+        output : {'auto', 'dense', 'sparse'}, with 'auto' a CSR matrix is returned when one hot columns are encoded and
+            the density of the output is below sparse_threshold, the same rule as ColumnTransformer
+        sparse_threshold : See output
+        """
+        self.category_levels = category_levels
+        self.ord_cols = ord_cols
+        self.oh_cols = oh_cols
+        self.scaling_cols = scaling_cols
+        self.dtype = dtype
+        self.output = output
+        self.sparse_threshold = sparse_threshold
+
+    def fit(self, X: pd.DataFrame, y = None):
+        if not self.output in ['auto', 'dense', 'sparse']:
+            raise ValueError("The 'output' argument must be one of: 'auto', 'dense', 'sparse'")
+
+        ord_cols = list(self.ord_cols or []) if self.category_levels else []
+        if len(ord_cols) != len(self.category_levels or []) and ord_cols:
+            raise ValueError("The 'category_levels' argument must have a list of levels for each of the 'ord_cols'")
+
+        self.ord_cols_ = ord_cols
+        self.oh_cols_ = list(self.oh_cols or [])
+        self.scaling_cols_ = list(self.scaling_cols or [])
+
+        self.vocabularies_ = {col: pd.Index(levels) for col, levels in zip(self.ord_cols_, self.category_levels or [])}
+        for col in self.oh_cols_:
+            values = X[col].dropna().unique()
+            self.vocabularies_[col] = pd.Index(np.sort(np.asarray(values, dtype = object)))
+
+        scaling_values = X[self.scaling_cols_].to_numpy(dtype = np.float64)
+        self.mean_ = scaling_values.mean(axis = 0)
+        self.scale_ = scaling_values.std(axis = 0)
+        self.scale_[self.scale_ == 0] = 1
+
+        encoded = set(self.ord_cols_ + self.oh_cols_ + self.scaling_cols_)
+        self.remainder_cols_ = [col for col in X.columns if col not in encoded]
+
+        # Standardized and passthrough values would be silently truncated or wrapped around by an integer dtype
+        if np.issubdtype(np.dtype(self.dtype), np.integer) and (self.scaling_cols_ or self.remainder_cols_):
+            raise ValueError(
+                f"An integer 'dtype' can only encode the ordinal and one hot columns, "
+                f"set 'scaling_cols' to [] and remove the columns {self.scaling_cols_ + self.remainder_cols_} from the input"
+            )
+
+        self.feature_names_ = (
+            self.ord_cols_
+            + [f'{col}_{level}' for col in self.oh_cols_ for level in self.vocabularies_[col]]
+            + self.scaling_cols_
+            + self.remainder_cols_
+        )
+        self.n_features_in_ = X.shape[1]
+
+        # Each row has one non zero one hot feature per column, the other features are dense
+        n_dense = len(self.ord_cols_) + len(self.scaling_cols_) + len(self.remainder_cols_)
+        density = (n_dense + len(self.oh_cols_)) / max(len(self.feature_names_), 1)
+        self.sparse_output_ = self.output == 'sparse' or (self.output == 'auto' and bool(self.oh_cols_) and density < self.sparse_threshold)
+
+        return self
+
+    def transform(self, X: pd.DataFrame):
+        check_is_fitted(self, 'feature_names_')
+        n_rows = len(X)
+
+        dense_blocks = [self._codes(X[col], col) for col in self.ord_cols_]
+        oh_codes = [self._codes(X[col], col) for col in self.oh_cols_]
+        scaled = [(X[col].to_numpy(dtype = np.float64) - mean) / scale for col, mean, scale in zip(self.scaling_cols_, self.mean_, self.scale_)]
+        remainder = [X[col].to_numpy() for col in self.remainder_cols_]
+
+        oh_sizes = [len(self.vocabularies_[col]) for col in self.oh_cols_]
+        oh_offsets = len(self.ord_cols_) + np.concatenate([[0], np.cumsum(oh_sizes)[:-1]]).astype(np.int64)
+        n_oh = int(sum(oh_sizes))
+
+        if self.sparse_output_:
+            return self._sparse_transform(n_rows, dense_blocks, oh_codes, oh_offsets, n_oh, scaled + remainder)
+
+        output = np.zeros((n_rows, len(self.feature_names_)), dtype = self.dtype)
+        for i, codes in enumerate(dense_blocks):
+            output[:, i] = codes
+        rows = np.arange(n_rows)
+        for offset, codes in zip(oh_offsets, oh_codes):
+            output[rows, offset + codes] = 1
+        for i, values in enumerate(scaled + remainder, start = len(self.ord_cols_) + n_oh):
+            output[:, i] = values
+
+        return output
+
+    def get_feature_names(self):
+        check_is_fitted(self, 'feature_names_')
+        return list(self.feature_names_)
+
+    def _codes(self, values: pd.Series, col):
+        """Integer codes of a column in the fixed vocabulary of 'col', raises a ValueError for unknown values"""
+        vocabulary = self.vocabularies_[col]
+
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Re-map the column's own codes, the lookup array is only as long as its categories
+            lookup = np.append(vocabulary.get_indexer(values.cat.categories), -1)
+            codes = lookup[values.cat.codes.to_numpy()]
+        else:
+            codes = pd.Categorical(values, categories = vocabulary).codes
+
+        if (codes < 0).any():
+            unknown = pd.unique(values[codes < 0])
+            raise ValueError(f"Found unknown categories {list(unknown)} in column '{col}' during transform")
+
+        return codes.astype(np.int64)
+
+    def _sparse_transform(self, n_rows, dense_blocks, oh_codes, oh_offsets, n_oh, numeric_blocks):
+        """CSR output with a fixed number of stored values per row, explicit zeros are removed like ColumnTransformer"""
+        first_numeric = len(self.ord_cols_) + n_oh
+        n_stored = len(dense_blocks) + len(oh_codes) + len(numeric_blocks)
+
+        indices = np.empty((n_rows, n_stored), dtype = np.int32)
+        data = np.empty((n_rows, n_stored), dtype = self.dtype)
+
+        # Columns of each row are filled in increasing order, so the indices of every row are already sorted
+        position = 0
+        for i, codes in enumerate(dense_blocks):
+            indices[:, position], data[:, position] = i, codes
+            position += 1
+        for offset, codes in zip(oh_offsets, oh_codes):
+            indices[:, position], data[:, position] = offset + codes, 1
+            position += 1
+        for i, values in enumerate(numeric_blocks, start = first_numeric):
+            indices[:, position], data[:, position] = i, values
+            position += 1
+
+        indptr = np.arange(0, n_rows * n_stored + 1, n_stored, dtype = np.int64)
+        output = sparse.csr_matrix((data.ravel(), indices.ravel(), indptr), shape = (n_rows, len(self.feature_names_)))
+        output.eliminate_zeros()
+
+        return output
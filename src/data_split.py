@@ -2,48 +2,123 @@ import warnings
 
 warnings.filterwarnings('ignore', message = "^.*sharex")  # ignore seaborn's catplot warning about using 'sharex = False' and 'color = None'
 
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 from sklearn.model_selection import train_test_split
 
+# Resolution of the hash based split, test_size is rounded to a multiple of 1 / HASH_BUCKETS
+HASH_BUCKETS = 10_000
 
-def test_split(data, test_size, random_state = None):
-    X = data.drop(columns = 'salary')
-    y = data['salary']
-    
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = test_size, random_state = random_state)
-    _report_split(X_train, 'train')
-    _report_split(X_test, 'test')
+
+def split_data(data, test_size, random_state = None, stratify = None, hash_id = None):
+    """Split a dataframe into train and test sets
+
+    Parameters
+    ----------
+    data : dataframe to split
+    test_size : fraction of the rows to put in the test set
+    random_state : seed for the random split, or the hash key for a hash based split
+    stratify : optional column or list of columns; every combination of their values is split in the same proportions
+    hash_id : optional id column (i.e. 'jobId') to split on a hash of its values instead of shuffling the rows.
+        A row always lands in the same split for a given random_state, no matter what other rows are in the data,
+        and both splits keep the original row order.
+
+    Returns a tuple of (train, test) dataframes
+    """
+    if hash_id and stratify:
+        raise ValueError("The 'stratify' and 'hash_id' arguments can't be used together")
+
+    if hash_id:
+        test_mask = _hash_test_mask(data[hash_id], test_size, random_state)
+        return data.loc[~test_mask], data.loc[test_mask]
+
+    strata = None
+    if stratify:
+        # Integer label for each combination of values, computed in a single groupby
+        strata = data.groupby(stratify, sort = False).ngroup().to_numpy()
+
+    return train_test_split(data, test_size = test_size, random_state = random_state, stratify = strata)
+
+
+def test_split(data, test_size, random_state = None, **split_kwargs):
+    """Split the data and report the distributions of both splits, split_kwargs are passed to split_data()"""
+    train, test = split_data(data, test_size, random_state = random_state, **split_kwargs)
+
+    _report_split(train.drop(columns = 'salary'), 'train')
+    _report_split(test.drop(columns = 'salary'), 'test')
+
+
+def split_counts(data) -> pd.DataFrame:
+    """Long form table of the value counts of each column, used for the split diagnostics
+
+    Returns a dataframe with the columns: variable, value, count, percent
+    """
+    counts = []
+    for col in data.columns:
+        col_counts = data[col].value_counts(sort = False).sort_index()
+        counts.append(pd.DataFrame({
+            'variable': col,
+            'value': col_counts.index.astype(str),
+            'count': col_counts.to_numpy(),
+            'percent': col_counts.to_numpy() / len(data)
+        }))
+
+    return pd.concat(counts, ignore_index = True)
+
+
+def compare_splits(train, test, columns = None) -> pd.DataFrame:
+    """Compare the percentage of each value between the train and test sets
+
+    Returns a dataframe indexed by (variable, value) with the columns: train_percent, test_percent, difference
+    """
+    columns = columns or _plot_columns(train)
+
+    comparison = pd.concat([
+        split_counts(train[columns]).set_index(['variable', 'value']).percent.rename('train_percent'),
+        split_counts(test[columns]).set_index(['variable', 'value']).percent.rename('test_percent')
+    ], axis = 1).fillna(0)
+    comparison['difference'] = comparison.test_percent - comparison.train_percent
+
+    return comparison
 
 
 def visualize_split(data, sharex = False, sharey = False):
-    
+
+    counts = split_counts(data[_plot_columns(data)])
+
+    sns.catplot(x = 'value', y = 'count', col = 'variable', data = counts, kind = 'bar', color = 'C0', sharex = sharex, sharey = sharey, col_wrap = 3)
+    plt.show()
+
+
+def _plot_columns(data):
     # Drop these columns from the visualization as they won't be needed
     _droppable_columns = ['jobId', 'companyId', 'salary']
-    
-    cols_to_drop = [i for i in _droppable_columns if i in data.columns]
-    
-    if cols_to_drop:
-        data = data.drop(columns = cols_to_drop)
-        
-    data_melted = pd.melt(data)
-    
-    sns.catplot(x = 'value', col = 'variable', data = data_melted, kind = 'count', sharex = sharex, sharey = sharey, col_wrap = 3)
-    plt.show()
-    
-    
+
+    return [i for i in data.columns if i not in _droppable_columns]
+
+
+def _hash_test_mask(ids, test_size, random_state = None):
+    """Boolean mask of the rows that belong to the test set, from a hash of each id"""
+    # hash_pandas_object is vectorized and deterministic for a given 16 character hash key
+    hash_key = f"{random_state or 0:016d}"[-16:]
+    hashes = pd.util.hash_pandas_object(ids, index = False, hash_key = hash_key).to_numpy()
+
+    return (hashes % np.uint64(HASH_BUCKETS)) < round(test_size * HASH_BUCKETS)
+
+
 def _report_split(data, split):
-    
+
     if not split in ['test', 'train']:
         raise ValueError("The 'split' argument must be one of 'test' or 'train'")
-    
+
     split_end = "TEST" if split == "test" else "TRAIN"
-    
+
     print("-"*30)
     print(f"{split_end} DATA shape: {data.shape}")
     print(f"{split_end} DATA distributions")
     visualize_split(data)
-    
+
     print(f"{split_end} DATA: Value counts for 'major' column:")
-    print(data.major.value_counts())
\ No newline at end of file
+    print(data.major.value_counts())
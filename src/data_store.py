@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import psutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
+from pandas.api.types import CategoricalDtype
+
+# Fixed vocabularies of the categorical features. Using the same categories everywhere
+# keeps the category codes stable between files, chunks and the deployed model.
+CATEGORY_LEVELS = {
+    'jobType': ['JANITOR', 'JUNIOR', 'SENIOR', 'MANAGER', 'VICE_PRESIDENT', 'CFO', 'CTO', 'CEO'],
+    'degree': ['NONE', 'HIGH_SCHOOL', 'BACHELORS', 'MASTERS', 'DOCTORAL'],
+    'major': ['NONE', 'CHEMISTRY', 'LITERATURE', 'BIOLOGY', 'PHYSICS', 'COMPSCI', 'MATH', 'BUSINESS', 'ENGINEERING'],
+    'industry': ['EDUCATION', 'SERVICE', 'AUTO', 'HEALTH', 'WEB', 'FINANCE', 'OIL']
+}
+
+# Input columns of the deployed model pipeline, in the order it was trained with
+FEATURE_COLUMNS = ['jobType', 'degree', 'major', 'industry', 'yearsExperience', 'milesFromMetropolis']
+
+# Identifier columns, stored with dictionary encoding and loaded as pandas categoricals
+ID_COLUMNS = ['jobId', 'companyId']
+
+# Storage dtypes for every known column of the project's data files
+COLUMN_DTYPES = {
+    **{col: CategoricalDtype(levels) for col, levels in CATEGORY_LEVELS.items()},
+    'yearsExperience': 'uint8',
+    'milesFromMetropolis': 'uint8',
+    'salary': 'int16'
+}
+
+STORE_FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+
+
+def convert_csv(csv_path, store_path = None, store_format = 'parquet', chunksize = 250_000):
+    """Convert one of the project's CSV files to a typed columnar file.
+
+    The four categorical features are stored with their fixed vocabularies (see CATEGORY_LEVELS), the numeric
+    features as small integers and 'jobId'/'companyId' with dictionary encoding. Files written with an index
+    (i.e. data/interim and data/processed) keep it as the dataframe index.
+
+    Parquet files are written in chunks of 'chunksize' rows, so memory use is bounded by the chunk size.
+    Feather files are written uncompressed so they can be memory mapped, which requires the whole file in memory.
+
+    Parameters
+    ----------
+
+    csv_path : Path of the CSV file
+    store_path : Output path, by default the CSV path with the extension of the format
+    store_format : {'parquet', 'feather'}
+    chunksize : Number of rows per chunk (parquet row group)
+
+    Returns the output path
+    """
+    if not store_format in STORE_FORMATS:
+        raise ValueError("The 'store_format' argument must be one of: 'parquet', 'feather'")
+
+    if store_path is None:
+        store_path = os.path.splitext(csv_path)[0] + STORE_FORMATS[store_format]
+
+    read_kwargs = _csv_read_kwargs(csv_path)
+
+    if store_format == 'feather':
+        data = pd.read_csv(csv_path, **read_kwargs)
+        feather.write_feather(_encode_id_columns(data), store_path, compression = 'uncompressed')
+        return store_path
+
+    writer = None
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize = chunksize, **read_kwargs):
+            # String id columns are dictionary encoded by the parquet writer, and decoded as categoricals in load_dataset()
+            table = pa.Table.from_pandas(chunk, schema = writer.schema if writer else None, preserve_index = 'index_col' in read_kwargs)
+            if writer is None:
+                writer = pq.ParquetWriter(store_path, table.schema, use_dictionary = True)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return store_path
+
+
+def convert_directory(data_dir, store_format = 'parquet', **kwargs):
+    """Convert every CSV file in the raw, interim and processed sub directories of 'data_dir'
+
+    kwargs are passed to convert_csv(). Returns a list of the output paths
+    """
+    converted = []
+    for sub_dir in ['raw', 'interim', 'processed']:
+        directory = os.path.join(data_dir, sub_dir)
+        if not os.path.isdir(directory):
+            continue
+
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith('.csv'):
+                converted.append(convert_csv(os.path.join(directory, file_name), store_format = store_format, **kwargs))
+
+    return converted
+
+
+def load_dataset(path, columns = None, memory_map = True) -> pd.DataFrame:
+    """Load a file written by convert_csv() into a typed dataframe.
+
+    Parameters
+    ----------
+
+    path : Path of a .parquet or .feather file
+    columns : Optional list of columns to load, other columns are never read from disk
+    memory_map : Memory map the file instead of reading it into a buffer. For uncompressed feather files
+        this allows numeric columns to be used without copying them.
+    """
+    if path.endswith(STORE_FORMATS['feather']):
+        table = feather.read_table(path, columns = columns, memory_map = memory_map)
+    else:
+        read_dictionary = [col for col in ID_COLUMNS if columns is None or col in columns]
+        table = pq.read_table(path, columns = columns, memory_map = memory_map, read_dictionary = read_dictionary)
+
+    return table.to_pandas()
+
+
+def read_chunks(path, chunksize, columns = None):
+    """Yield dataframes of 'chunksize' rows from a CSV or Parquet file, so large files can be processed with bounded memory"""
+    if path.endswith(STORE_FORMATS['parquet']):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size = chunksize, columns = columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols = columns, chunksize = chunksize)
+
+
+def compare_load(csv_path, store_path, columns = None) -> pd.DataFrame:
+    """Compare load time and memory of a CSV file with its columnar version.
+
+    Each load runs in a freshly spawned process so that the resident memory (RSS) increase can be attributed to it.
+    Memory mapped pages of a feather file count towards RSS once they are touched.
+
+    Returns a dataframe with a row for each loader, and the columns:
+    load_seconds, rss_increase_mb, frame_memory_mb
+    """
+    loads = {
+        'csv': (_load_csv, csv_path),
+        os.path.splitext(store_path)[1].lstrip('.'): (load_dataset, store_path)
+    }
+
+    results = {}
+    for name, (loader, path) in loads.items():
+        with ProcessPoolExecutor(max_workers = 1, mp_context = multiprocessing.get_context('spawn')) as executor:
+            results[name] = executor.submit(_measure_load, loader, path, columns).result()
+
+    return pd.DataFrame(results).T
+
+
+def _csv_read_kwargs(csv_path):
+    """Keyword arguments to read one of the project's CSV files with the storage dtypes"""
+    header = pd.read_csv(csv_path, nrows = 0).columns
+
+    read_kwargs = {'dtype': {col: dtype for col, dtype in COLUMN_DTYPES.items() if col in header}}
+
+    # Files saved with DataFrame.to_csv() have an unnamed index as their first column
+    if header[0].startswith('Unnamed'):
+        read_kwargs['index_col'] = 0
+
+    return read_kwargs
+
+
+def _encode_id_columns(data):
+    for col in ID_COLUMNS:
+        if col in data.columns:
+            data[col] = data[col].astype('category')
+
+    return data
+
+
+def _load_csv(path, columns = None):
+    """Load a CSV file the way the notebooks do, as the baseline for compare_load()"""
+    index_col = _csv_read_kwargs(path).get('index_col')
+    return pd.read_csv(path, usecols = columns, index_col = index_col)
+
+
+def _measure_load(loader, path, columns):
+    """Runs in a child process, see compare_load()"""
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+
+    start = time.perf_counter()
+    data = loader(path, columns = columns)
+    load_seconds = time.perf_counter() - start
+
+    return {
+        'load_seconds': load_seconds,
+        'rss_increase_mb': (process.memory_info().rss - rss_before) / 1e6,
+        'frame_memory_mb': data.memory_usage(deep = True).sum() / 1e6
+    }
+
+
+if __name__ == '__main__':
+    # Convert all of the project's data files, i.e. from the project directory: python -m src.data_store data
+    data_directory = sys.argv[1] if len(sys.argv) > 1 else 'data'
+    for output_path in convert_directory(data_directory):
+        print(f"Converted: {output_path}")
@@ -1,12 +1,220 @@
 import seaborn as sns
 import matplotlib.pyplot as plt
 import pandas as pd
+import numpy as np
 
+# Largest number of (cell, target value) histogram bins GroupedSalaryStats allocates, 8 bytes each
+MAX_HISTOGRAM_BINS = 100_000_000
 
-def salary_per_category_table(category, df, target = 'salary'):
-    """Aggregate the salaries dataframe grouped by the specified category and calculate the mean salary"""
+
+class GroupedSalaryStats:
+    def __init__(self, df, category_cols, target = 'salary', resolution = 1):
+        """
+        Grouped target statistics for every categorical column and column combination, computed in one pass.
+
+        Each category column is converted to categorical codes once, and every row is assigned to a cell of the
+        full cross product of the category levels. A single np.bincount then builds, per cell, a histogram of the
+        target values along with sums and sums of squares. Statistics for any single column or combination of columns
+        are aggregated from those cells, so count, mean, std, median and quartiles never need another pass
+        over the data. The tables are cached once computed.
+
+        Quantiles are exact when the target values are multiples of 'resolution' (salaries are whole numbers of $1000s),
+        otherwise they are rounded to the nearest multiple.
+
+        The histogram has (number of cells) x (number of target values) bins, so it is only practical for columns with a
+        few levels; numeric columns (i.e. yearsExperience) should be binned first. A ValueError is raised when it would
+        have more than MAX_HISTOGRAM_BINS bins.
+
+        Parameters
+        ----------
+
+        df : pandas dataframe with the category columns and the target
+        category_cols : list of categorical columns to compute statistics for
+        target : name of the target column
+        resolution : width of the target value histogram bins
+        """
+        if not isinstance(df, pd.DataFrame):
+            raise TypeError("The data should be a pandas dataframe.")
+
+        missing_cols = set(category_cols + [target]) - set(df.columns)
+        if missing_cols:
+            raise ValueError(f"The following columns are not in the data: {', '.join(missing_cols)}")
+
+        self.category_cols = list(category_cols)
+        self.target = target
+        # Rows the codes were computed for, encode() checks that a dataframe has the same rows in the same order
+        self.n_rows = len(df)
+        self.index = df.index
+        self.resolution = resolution
+        self.levels = {}
+        self.codes = {}
+        self._tables = {}
+
+        y = df[target].to_numpy(dtype = np.float64)
+        valid_rows = ~np.isnan(y)
+
+        for col in self.category_cols:
+            categorical = df[col].astype('category')
+            self.levels[col] = categorical.cat.categories
+            self.codes[col] = categorical.cat.codes.to_numpy()
+            valid_rows &= self.codes[col] >= 0
+
+        self.shape = tuple(len(self.levels[col]) for col in self.category_cols)
+        # Python ints, so a huge cross product doesn't overflow before it is checked
+        n_cells = 1
+        for n_levels in self.shape:
+            n_cells *= n_levels
+
+        y = y[valid_rows]
+        value_idx = np.round((y - y.min()) / resolution).astype(np.int64)
+        n_values = int(value_idx.max()) + 1
+
+        # The histogram has a count for every value of every cell of the cross product, check its size before allocating it
+        if n_cells * n_values > MAX_HISTOGRAM_BINS:
+            raise ValueError(
+                f"The histogram of {' x '.join(f'{col} ({n})' for col, n in zip(self.category_cols, self.shape))} levels "
+                f"and {n_values} target values would have {n_cells * n_values:,} bins ({n_cells * n_values * 8 / 1e9:,.1f} GB), "
+                f"more than MAX_HISTOGRAM_BINS ({MAX_HISTOGRAM_BINS:,}). Use columns with fewer levels (i.e. bin numeric "
+                f"columns first), fewer columns, or a larger 'resolution'."
+            )
+
+        self.values = y.min() + resolution * np.arange(n_values)
+        cell = np.zeros(int(valid_rows.sum()), dtype = np.int64)
+        for col in self.category_cols:
+            cell = cell * len(self.levels[col]) + self.codes[col][valid_rows]
+
+        self.cell_hist = np.bincount(cell * n_values + value_idx, minlength = n_cells * n_values).reshape(self.shape + (n_values,))
+        self.cell_sum = np.bincount(cell, weights = y, minlength = n_cells).reshape(self.shape)
+        self.cell_sumsq = np.bincount(cell, weights = y ** 2, minlength = n_cells).reshape(self.shape)
+
+    def table(self, category = None) -> pd.DataFrame:
+        """Statistics of the target grouped by a column or list of columns, None gives the overall statistics
+        
+        Returns a dataframe indexed by the category levels (only levels present in the data) with the columns:
+        count, mean, std, min, lower_quartile, median, upper_quartile, max
+        """
+        category = self._check_category(category)
+        key = tuple(category)
+
+        if not key in self._tables:
+            hist, sums, sumsq = self._aggregate(category)
+            self._tables[key] = self._make_table(category, hist, sums, sumsq)
+
+        return self._tables[key]
+
+    def histogram_frame(self, category) -> pd.DataFrame:
+        """Long form dataframe of target value counts per category level, used to plot histograms without the raw data"""
+        category = self._check_category(category)
+        hist, _, _ = self._aggregate(category)
+
+        index = pd.MultiIndex.from_product([self.levels[col] for col in category] + [self.values], names = category + [self.target])
+        frame = pd.DataFrame({'count': hist.ravel()}, index = index)
+
+        return frame.loc[frame['count'] > 0].reset_index()
+
+    def encode(self, col, stat = 'median', df = None) -> np.ndarray:
+        """Replace each row's category level with a statistic of that level, using the stored codes
+
+        The values are in the order of the rows the statistics were built from. If 'df' is given, a ValueError is raised
+        unless it has the same rows in the same order (the same index), i.e. when it was filtered or shuffled since.
+        """
+        if df is not None:
+            self.check_rows(df)
+
+        level_stats = self.table(col)[stat].reindex(self.levels[col]).to_numpy()
+
+        encoded = np.full(len(self.codes[col]), np.nan)
+        observed = self.codes[col] >= 0
+        encoded[observed] = level_stats[self.codes[col][observed]]
+
+        return encoded
+
+    def check_rows(self, df):
+        """Raise a ValueError unless 'df' has the rows the statistics were built from, in the same order"""
+        if len(df) != self.n_rows:
+            raise ValueError(f"The statistics were built from {self.n_rows} rows, the data has {len(df)} rows")
+
+        if not df.index.equals(self.index):
+            raise ValueError("The data doesn't have the same index as the data the statistics were built from, it was filtered or reordered")
+
+    def _check_category(self, category):
+        if category is None:
+            return []
+
+        category = [category] if isinstance(category, str) else list(category)
+        unknown_cols = set(category) - set(self.category_cols)
+        if unknown_cols:
+            raise ValueError(f"Statistics were not computed for: {', '.join(unknown_cols)}")
+
+        return category
+
+    def _aggregate(self, category):
+        """Sum the cell arrays over every axis not in 'category', with axes ordered as in 'category'"""
+        keep_axes = [self.category_cols.index(col) for col in category]
+        drop_axes = tuple(i for i in range(len(self.category_cols)) if i not in keep_axes)
+        # after summing, the kept axes stay in their original relative order, this puts them in the requested order
+        order = list(np.argsort(np.argsort(keep_axes)))
+        n_groups = int(np.prod([len(self.levels[col]) for col in category]))
+
+        hist = np.transpose(self.cell_hist.sum(axis = drop_axes), order + [len(category)])
+        sums = np.transpose(self.cell_sum.sum(axis = drop_axes), order)
+        sumsq = np.transpose(self.cell_sumsq.sum(axis = drop_axes), order)
+
+        return hist.reshape(n_groups, -1), sums.reshape(n_groups), sumsq.reshape(n_groups)
+
+    def _make_table(self, category, hist, sums, sumsq):
+        counts = hist.sum(axis = 1)
+        observed = counts > 0
+        hist, sums, sumsq, counts = hist[observed], sums[observed], sumsq[observed], counts[observed]
+
+        means = sums / counts
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            stds = np.sqrt(np.maximum(sumsq - counts * means ** 2, 0) / (counts - 1))
+
+        nonzero = hist > 0
+        table = pd.DataFrame({
+            'count': counts,
+            'mean': means,
+            'std': stds,
+            'min': self.values[nonzero.argmax(axis = 1)],
+            'lower_quartile': self._hist_quantile(hist, 0.25),
+            'median': self._hist_quantile(hist, 0.5),
+            'upper_quartile': self._hist_quantile(hist, 0.75),
+            'max': self.values[hist.shape[1] - 1 - nonzero[:, ::-1].argmax(axis = 1)]
+        })
+
+        if category:
+            index = pd.MultiIndex.from_product([self.levels[col] for col in category], names = category)
+            table.index = index[observed] if len(category) > 1 else index[observed].get_level_values(0)
+
+        return table
+
+    def _hist_quantile(self, hist, q):
+        """Quantiles per row of a value histogram, linearly interpolated between order statistics (same as pandas)"""
+        cumulative = np.cumsum(hist, axis = 1)
+        n = cumulative[:, -1]
+        position = (n - 1) * q
+        lower = np.floor(position)
+        upper = np.minimum(lower + 1, n - 1)
+
+        # The k-th smallest value (0 based) is in the first bin where the cumulative count exceeds k
+        lower_values = self.values[(cumulative <= lower[:, None]).sum(axis = 1)]
+        upper_values = self.values[(cumulative <= upper[:, None]).sum(axis = 1)]
+
+        return lower_values + (position - lower) * (upper_values - lower_values)
+
+
+def salary_per_category_table(category, df, target = 'salary', stats = None):
+    """Aggregate the salaries dataframe grouped by the specified category and calculate the mean salary
+    
+    If 'stats' is given (a GroupedSalaryStats instance), the cached grouped statistics are used instead of grouping 'df'
+    """
+    
+    if stats is not None:
+        aggregated_table = stats.table(category)[['mean']].rename(columns = {'mean': target}).reset_index()
+    else:
+        aggregated_table = df.groupby(category)[target].mean().to_frame().reset_index()
     
-    aggregated_table = df.groupby(category).salary.mean().to_frame().reset_index()
     aggregated_table.sort_values(by = target, inplace = True, ignore_index = True)
     
     return aggregated_table
@@ -30,12 +238,24 @@ def salary_per_category_plot(category, df, target = 'salary', order = None, hue_
     
     
 def faceted_histogram_plot(data, grid_col, grid_kwargs = {}, plot_kwargs = {}, target = 'salary', save_path = None):
+    """Grid of target histograms per category level
+    
+    'data' can be either the raw dataframe, or a GroupedSalaryStats instance in which case the histograms are drawn
+    from the cached value counts, without splitting the raw data for every facet.
+    """
     
-    if not isinstance(data, pd.DataFrame):
-        raise TypeError("The data should be a pandas dataframe.")
+    if isinstance(data, GroupedSalaryStats):
+        facet_cols = [grid_col] + ([grid_kwargs['row']] if 'row' in grid_kwargs else [])
+        target = data.target
+        data = data.histogram_frame(facet_cols)
+        weights = ['count']
+    elif isinstance(data, pd.DataFrame):
+        weights = []
+    else:
+        raise TypeError("The data should be a pandas dataframe or a GroupedSalaryStats instance.")
     
     plotGrid = sns.FacetGrid(data, col = grid_col, **grid_kwargs)
-    plotGrid.map(_faceted_IQR_histogram_figure, target, **plot_kwargs)
+    plotGrid.map(_faceted_IQR_histogram_figure, target, *weights, **plot_kwargs)
     plt.legend(bbox_to_anchor = (1,1))
 
     if save_path:
@@ -44,18 +264,26 @@ def faceted_histogram_plot(data, grid_col, grid_kwargs = {}, plot_kwargs = {}, t
     plt.show()
     
     
-def _faceted_IQR_histogram_figure(x, plot_stats = None, y_text_scale = 0.20, x_text_coord = 170, **kwargs):
-    """This plotting function is for internal use within the 'faceted_histogram_plot' function and gets fed into the FacetGrid().map() method"""
+def _faceted_IQR_histogram_figure(x, weights = None, plot_stats = None, y_text_scale = 0.20, x_text_coord = 170, **kwargs):
+    """This plotting function is for internal use within the 'faceted_histogram_plot' function and gets fed into the FacetGrid().map() method
+    
+    'weights' holds the value counts when plotting from GroupedSalaryStats.histogram_frame()
+    """
     
     if not 0 <= y_text_scale <= 1:
         raise ValueError("The 'y_text_scale' argument should be between 0 and 1.")
     
-    sns.histplot(x, **kwargs)
+    sns.histplot(x = x, weights = weights, **kwargs)
     # add text to display the sample mean and standard deviation corresponding to each facet in the grid
     _, y_scale_top = plt.ylim()
     y_scale_top -= y_scale_top * y_text_scale  # Scale down the placement of the y-coordinate of text so that it is slightly lower than the limit of the y-axis
-    subset_mean = int(x.mean())
-    subset_std = int(x.std())
+    if weights is None:
+        subset_mean = int(x.mean())
+        subset_std = int(x.std())
+    else:
+        weighted_mean = np.average(x, weights = weights)
+        subset_mean = int(weighted_mean)
+        subset_std = int(np.sqrt(np.sum(weights * (x - weighted_mean) ** 2) / (weights.sum() - 1)))
     plt.text(x = x_text_coord, y = y_scale_top, s = f"Avg: {subset_mean}\nStd: {subset_std}")
     
     if plot_stats:
@@ -80,6 +308,19 @@ class PlotStats:
         self.median = target.median()
         self.lower_quartile = target.quantile(0.25)
         self.upper_quartile = target.quantile(0.75)
+    
+    @classmethod
+    def from_grouped_stats(cls, stats):
+        """Make a PlotStats from the overall statistics cached in a GroupedSalaryStats instance"""
+        overall = stats.table().iloc[0]
+        
+        plot_stats = cls.__new__(cls)
+        plot_stats.mean = overall['mean']
+        plot_stats.median = overall['median']
+        plot_stats.lower_quartile = overall['lower_quartile']
+        plot_stats.upper_quartile = overall['upper_quartile']
+        
+        return plot_stats
         
     def plot_IQR(self, x_axis = False):
         """Add IQR range to plot based on y-axis variable, does not handle creating or showing figures (plt.figure/ plt.show)"""
@@ -108,26 +349,29 @@ class PlotStats:
             plt.axvspan(xmin = self.lower_quartile, xmax = self.upper_quartile, color = 'grey', label = plot_labels['IQR'], zorder = 0, alpha = 0.15)
             plt.legend(bbox_to_anchor = (1,1))
 
-def _encode_category(data, col):
+def _encode_category(data, col, stats = None):
     '''Replace category labels with the median value, for checking correlations'''
-    category_dict = dict()
-    categories = data[col].unique().tolist()
-    
-    # For each level in the category, calculate the median
-    for cat in categories:
-        category_dict[cat] = data[data[col] == cat]['salary'].median()
+    if stats is not None:
+        data[col] = stats.encode(col, 'median', df = data)
+    else:
+        # One grouped median per level, mapped back onto the rows
+        data[col] = data[col].map(data.groupby(col)['salary'].median())
     
-    # Map the median values to the data
-    data[col] = data[col].map(category_dict)
+def make_correlation_plot(df, category_cols, stats = None):
+    '''Make a correlation plot, encode categorical columns so that each levels label is replaced by the median price for that level
     
-def make_correlation_plot(df, category_cols):
-    '''Make a correlation plot, encode categorical columns so that each levels label is replaced by the median price for that level'''
+    If 'stats' is given (a GroupedSalaryStats instance built from 'df'), the cached level medians are used for the encoding,
+    a ValueError is raised if it was built from different rows
+    '''
+    if stats is not None:
+        stats.check_rows(df)
+
     # copy data to avoid altering the original
     data = df.copy()
     
     # Encode each categorical level with the median
     for col in category_cols:
-        _encode_category(data, col)
+        _encode_category(data, col, stats = stats)
     
     # Plot
     plt.figure(figsize = (12, 10))
@@ -0,0 +1,117 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+# Features of the salary data that are used to slice the residuals by default
+SLICE_FEATURES = ['jobType', 'industry', 'degree', 'major', 'milesFromMetropolis', 'yearsExperience']
+
+
+class ErrorSlices:
+    def __init__(self, data: pd.DataFrame, threshold, residual_col = 'final_residuals', features = SLICE_FEATURES, pairs = True):
+        """
+        Large error rates and mean residuals for every single feature slice and every pair of features.
+
+        Each feature is converted to integer codes once. The statistics of every slice are then computed with
+        np.bincount over the codes (or the combined codes of a pair of features), so each feature or pair is a
+        single vectorized pass over the rows, with no melting or python level grouping.
+
+        A residual is a large error when its distance from the mean residual is greater than 'threshold',
+        the same definition as in plot_large_error_percentage().
+
+        Parameters
+        ----------
+
+        data : dataframe with the residuals and the features, i.e. the output of get_residuals(add_to_df = True)
+        threshold : distance from the mean residual to count as a large error, i.e. 2 * residual standard deviation
+        residual_col : name of the residual column
+        features : columns to slice on
+        pairs : also compute the slices for every pair of features
+        """
+        residuals = data[residual_col].to_numpy(dtype = np.float64)
+
+        self.threshold = threshold
+        self.features = list(features)
+        self.n_rows = len(residuals)
+        self.residual_mean = residuals.mean()
+
+        large_error = (np.abs(self.residual_mean - residuals) > threshold).astype(np.float64)
+        self.overall_large_error_rate = large_error.mean()
+
+        # Integer codes and the sorted level values of each feature, missing values have the code -1
+        self.codes = {}
+        self.levels = {}
+        for col in self.features:
+            self.codes[col], self.levels[col] = pd.factorize(data[col], sort = True)
+
+        tables = [self._slice_table([col], large_error, residuals) for col in self.features]
+        if pairs:
+            tables.extend(self._slice_table(list(pair), large_error, residuals) for pair in combinations(self.features, 2))
+
+        self.slices = pd.concat(tables, ignore_index = True)
+
+    def worst_slices(self, n = 20, min_support = 0.001, min_count = 30, by = 'large_error_rate', single_only = False) -> pd.DataFrame:
+        """Rank the slices with the highest large error rate (or any other column of 'slices')
+
+        Parameters
+        ----------
+
+        n : number of slices to return
+        min_support : minimum fraction of all the rows that a slice must contain
+        min_count : minimum number of rows that a slice must contain
+        by : column to rank by, i.e. 'large_error_rate', 'lift' or 'mean_residual'
+        single_only : only rank single feature slices
+        """
+        candidates = self.slices.loc[(self.slices['support'] >= min_support) & (self.slices['count'] >= min_count)]
+
+        if single_only:
+            candidates = candidates.loc[candidates.feature_2.isna()]
+
+        return candidates.sort_values(by, ascending = False).head(n)
+
+    def single_feature_table(self) -> pd.DataFrame:
+        """Large error rate of every level of every single feature, in the long format used by plot_large_error_percentage()"""
+        single = self.slices.loc[self.slices.feature_2.isna()]
+
+        return pd.DataFrame({
+            'column': single.feature_1.to_numpy(),
+            'value': single.value_1.to_numpy(),
+            'percent': single.large_error_rate.to_numpy()
+        })
+
+    def _slice_table(self, columns, large_error, residuals):
+        """Statistics of every slice of one feature or a pair of features"""
+        n_levels = [len(self.levels[col]) for col in columns]
+        n_slices = int(np.prod(n_levels))
+
+        codes = self.codes[columns[0]].astype(np.int64)
+        if len(columns) == 2:
+            codes = codes * n_levels[1] + self.codes[columns[1]]
+
+        # Rows with a missing value in any of the columns don't belong to a slice, like the groups of a groupby
+        known = np.logical_and.reduce([self.codes[col] >= 0 for col in columns])
+        if not known.all():
+            codes, large_error, residuals = codes[known], large_error[known], residuals[known]
+
+        counts = np.bincount(codes, minlength = n_slices)
+        large_errors = np.bincount(codes, weights = large_error, minlength = n_slices)
+        residual_sums = np.bincount(codes, weights = residuals, minlength = n_slices)
+
+        # Only keep the slices that have rows
+        observed = np.flatnonzero(counts)
+        counts = counts[observed]
+        level_idx = np.unravel_index(observed, n_levels)
+
+        table = pd.DataFrame({
+            'feature_1': columns[0],
+            'value_1': np.asarray(self.levels[columns[0]], dtype = object)[level_idx[0]],
+            'feature_2': columns[1] if len(columns) == 2 else None,
+            'value_2': np.asarray(self.levels[columns[1]], dtype = object)[level_idx[1]] if len(columns) == 2 else None,
+            'count': counts,
+            'support': counts / self.n_rows,
+            'large_error_rate': large_errors[observed] / counts,
+            'mean_residual': residual_sums[observed] / counts
+        })
+        table['lift'] = table.large_error_rate / self.overall_large_error_rate if self.overall_large_error_rate else np.nan
+
+        return table
@@ -0,0 +1,318 @@
+"""
+Reduced variants of a trained XGBoost model, for latency critical serving with a known accuracy cost.
+
+Three reductions are available, each returns a new model with the same type (pipeline or bare XGBRegressor) as the input:
+    truncate_trees() keeps only the first boosting rounds
+    quantize_leaves() snaps the leaf values of every tree to an n-bit grid, so the serialized model compresses better
+    merge_redundant_trees() folds trees whose outputs are nearly collinear with an earlier tree into that tree
+
+merge_thresholds() finds the correlation thresholds that merge a given fraction of the trees of a model, the correlations
+between trees depend a lot on the model (learning rate, depth, features), so fixed thresholds may merge nothing.
+
+compare_variants() reports the test MSE, artifact sizes and per-row latency of each variant.
+
+Usage (after 'pip install -e .'):
+    compress-salary-model <model.pkl> <test.csv|test.parquet> [--output-dir DIR]
+"""
+import os
+import sys
+import gzip
+import json
+import pickle
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+from sklearn.metrics import mean_squared_error
+
+from src.data_store import FEATURE_COLUMNS, read_chunks
+from src.EvaluateModels import EvaluateModels
+
+DEFAULT_N_TREES = (100, 150, 200)
+DEFAULT_LEAF_BITS = (8, 6, 4)
+# Fractions of the trees that the default merge variants remove, see merge_thresholds()
+DEFAULT_MERGE_FRACTIONS = (0.05, 0.1, 0.25)
+
+
+def truncate_trees(model, n_trees):
+    """Keep the first 'n_trees' boosting rounds of the model"""
+    booster = _get_regressor(model).get_booster()
+
+    return _with_booster(model, booster[:n_trees])
+
+
+def quantize_leaves(model, n_bits = 8):
+    """Snap the leaf values of every tree to 2 ** n_bits evenly spaced values between the tree's smallest and largest leaf
+
+    Every leaf can then be stored as an n_bits code with an offset and step per tree. Early trees have leaf values
+    of tens of thousands of dollars and late trees of a few dollars, so the grid is per tree rather than shared.
+    """
+    model_json = _booster_json(_get_regressor(model).get_booster())
+
+    for tree in model_json['learner']['gradient_booster']['model']['trees']:
+        leaves = np.flatnonzero(np.asarray(tree['left_children']) == -1)
+        values = np.asarray(tree['split_conditions'], dtype = np.float64)[leaves]
+
+        low, step = values.min(), (values.max() - values.min()) / (2 ** n_bits - 1)
+        quantized = low + np.round((values - low) / step) * step if step > 0 else values
+
+        _set_leaf_values(tree, leaves, quantized)
+
+    return _with_booster(model, _booster_from_json(model_json))
+
+
+def merge_redundant_trees(model, X, min_correlation = 0.95, sample_size = 10_000, random_state = 0):
+    """Fold every tree whose output is nearly collinear with an earlier tree into that tree
+
+    The output of each tree is computed on a sample of X. Trees are visited in boosting order, and a tree whose output
+    has a correlation of at least 'min_correlation' with a kept tree is removed; the kept tree's leaves are rescaled and
+    shifted by the least squares fit of the removed tree on it, f_kept' = (1 + beta) * f_kept + c, which is exact when the
+    correlation is 1. Trees with a constant output on the sample are folded in as the constant c.
+
+    Parameters
+    ----------
+    model : Fitted pipeline or XGBRegressor
+    X : Feature matrix in the format of the model's input
+    min_correlation : Minimum absolute correlation between the outputs of two trees to merge them
+    sample_size : Number of rows of X used to compute the tree outputs
+    random_state : Seed for sampling the rows
+    """
+    model_json = _booster_json(_get_regressor(model).get_booster())
+    gbtree = model_json['learner']['gradient_booster']['model']
+    trees = gbtree['trees']
+
+    leaf_values = [np.asarray(tree['split_conditions'], dtype = np.float64) for tree in trees]
+    outputs = _tree_outputs(model, X, sample_size, random_state)
+
+    centered = outputs - outputs.mean(axis = 0)
+    norms = np.linalg.norm(centered, axis = 0)
+
+    kept = []
+    for j in range(len(trees)):
+        if not kept:
+            kept.append(j)
+            continue
+
+        if norms[j] == 0:
+            target, beta = kept[0], 0.0
+        else:
+            valid = [i for i in kept if norms[i] > 0]
+            correlations = centered[:, valid].T @ centered[:, j] / (norms[valid] * norms[j]) if valid else np.zeros(0)
+            if not len(correlations) or np.abs(correlations).max() < min_correlation:
+                kept.append(j)
+                continue
+            best = int(np.abs(correlations).argmax())
+            target = valid[best]
+            beta = correlations[best] * norms[j] / norms[target]
+
+        shift = outputs[:, j].mean() - beta * outputs[:, target].mean()
+        leaf_values[target] = leaf_values[target] * (1 + beta) + shift
+        outputs[:, target] = outputs[:, target] * (1 + beta) + shift
+        centered[:, target] *= (1 + beta)
+        norms[target] *= abs(1 + beta)
+
+    for i in kept:
+        leaves = np.flatnonzero(np.asarray(trees[i]['left_children']) == -1)
+        _set_leaf_values(trees[i], leaves, leaf_values[i][leaves])
+
+    _keep_trees(gbtree, kept)
+
+    return _with_booster(model, _booster_from_json(model_json))
+
+
+def merge_thresholds(model, X, fractions = DEFAULT_MERGE_FRACTIONS, sample_size = 10_000, random_state = 0) -> list:
+    """Correlation thresholds for merge_redundant_trees() that merge about each of the 'fractions' of the model's trees
+
+    A threshold is the quantile of every tree's largest absolute output correlation with an earlier tree, the trees
+    above it are the ones that can be merged. The fraction actually merged is a bit lower, since a tree is only
+    compared with the trees that are kept.
+    """
+    outputs = _tree_outputs(model, X, sample_size, random_state)
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        correlations = np.nan_to_num(np.corrcoef(outputs, rowvar = False))
+    # Trees with a constant output are always merged, count them as perfectly correlated
+    correlations[:, outputs.std(axis = 0) == 0] = 1
+    best_earlier = np.abs(np.tril(correlations, -1)).max(axis = 1)[1:]
+
+    return [round(float(np.quantile(best_earlier, 1 - fraction)), 3) for fraction in fractions]
+
+
+def make_variants(model, X, n_trees = DEFAULT_N_TREES, leaf_bits = DEFAULT_LEAF_BITS, merge_correlations = None) -> dict:
+    """Dictionary of variant name -> reduced model, for every setting of each reduction. X is used to merge trees
+
+    merge_correlations defaults to the thresholds that merge DEFAULT_MERGE_FRACTIONS of the trees, see merge_thresholds()
+    """
+    if merge_correlations is None:
+        merge_correlations = merge_thresholds(model, X)
+
+    variants = {'original': model}
+    variants.update({f'truncate_{n}_trees': truncate_trees(model, n) for n in n_trees})
+    variants.update({f'quantize_{bits}_bit_leaves': quantize_leaves(model, bits) for bits in leaf_bits})
+    variants.update({f'merge_correlation_{corr}': merge_redundant_trees(model, X, corr) for corr in merge_correlations})
+
+    return variants
+
+
+def compare_variants(variants: dict, X_test, y_test, batch_size = 10_000, n_repeats = 50) -> pd.DataFrame:
+    """Test MSE, artifact size and latency of each variant from make_variants()
+
+    Returns a dataframe indexed by variant name with the columns:
+    n_trees, test_mse, mse_increase, model_size_mb, compressed_size_mb, leaf_storage_kb, single_row_latency_ms, batch_row_latency_us
+
+    The pickled size (model_size_mb) only depends on the number of trees and nodes, XGBoost stores every leaf as a
+    float32 however many distinct values there are. What quantizing changes is the size of the leaf values in a format
+    that stores them as codes (leaf_storage_kb, see _leaf_storage_bytes()) and the gzip size of the pickle.
+    """
+    # profile_inference() skips batch sizes larger than the test set
+    batch_size = min(batch_size, len(X_test))
+    results = {}
+    for name, model in variants.items():
+        profile = EvaluateModels.profile_inference(model, X_test, batch_sizes = (batch_size,), n_repeats = n_repeats)
+        model_json = _booster_json(_get_regressor(model).get_booster())
+        results[name] = {
+            'n_trees': len(model_json['learner']['gradient_booster']['model']['trees']),
+            'test_mse': mean_squared_error(y_test, model.predict(X_test)),
+            'model_size_mb': profile['model_size_mb'],
+            'compressed_size_mb': len(gzip.compress(pickle.dumps(model))) / 1e6,
+            'leaf_storage_kb': _leaf_storage_bytes(model_json) / 1e3,
+            'single_row_latency_ms': profile['single_row_latency_ms'],
+            'batch_row_latency_us': 1e6 / profile[f'throughput_{batch_size}']
+        }
+
+    report = pd.DataFrame(results).T
+    report.insert(2, 'mse_increase', report.test_mse - report.test_mse.iloc[0])
+
+    return report
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Compare reduced variants of a trained salary prediction model')
+    parser.add_argument('model', help = 'Pickled model pipeline')
+    parser.add_argument('test', help = 'CSV or Parquet file with the model features and the salary column')
+    parser.add_argument('--output-dir', default = None, help = 'Save every variant as <name>.pkl and the report as report.csv to this directory')
+    parser.add_argument('--max-rows', type = int, default = 200_000, help = 'Maximum number of test rows to evaluate on')
+    args = parser.parse_args(argv)
+
+    with open(args.model, 'rb') as file:
+        model = pickle.load(file)
+
+    test = next(read_chunks(args.test, args.max_rows, columns = FEATURE_COLUMNS + ['salary']))
+    X_test, y_test = test[FEATURE_COLUMNS], test['salary']
+
+    variants = make_variants(model, X_test)
+    report = compare_variants(variants, X_test, y_test)
+    print(report.to_string(float_format = '{:.3f}'.format))
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok = True)
+        report.to_csv(os.path.join(args.output_dir, 'report.csv'))
+        for name, variant in variants.items():
+            with open(os.path.join(args.output_dir, f'{name}.pkl'), 'wb') as file:
+                pickle.dump(variant, file)
+
+
+def _tree_outputs(model, X, sample_size, random_state):
+    """Output of every tree (the value of the leaf each row lands in) for a sample of the rows of X, one column per tree"""
+    preprocessing, regressor = _split_model(model)
+    booster = regressor.get_booster()
+    trees = _booster_json(booster)['learner']['gradient_booster']['model']['trees']
+
+    sample = X.sample(min(sample_size, len(X)), random_state = random_state)
+    features = preprocessing.transform(sample) if preprocessing is not None else sample
+
+    leaf_ids = booster.predict(xgb.DMatrix(features), pred_leaf = True).astype(np.int64).reshape(len(sample), -1)
+    leaf_values = [np.asarray(tree['split_conditions'], dtype = np.float64) for tree in trees]
+
+    return np.column_stack([leaf_values[i][leaf_ids[:, i]] for i in range(len(trees))])
+
+
+def _leaf_storage_bytes(model_json) -> int:
+    """Bytes to store the leaf values of every tree, either as float32 values or, when it is smaller, as a float32 table
+    of the tree's distinct leaf values plus a code per leaf with just enough bits to index it"""
+    total_bits = 0
+    for tree in model_json['learner']['gradient_booster']['model']['trees']:
+        leaves = np.flatnonzero(np.asarray(tree['left_children']) == -1)
+        n_distinct = len(np.unique(np.asarray(tree['split_conditions'], dtype = np.float32)[leaves]))
+        code_bits = int(np.ceil(np.log2(n_distinct))) if n_distinct > 1 else 0
+        total_bits += min(32 * len(leaves), 32 * n_distinct + code_bits * len(leaves))
+
+    return int(np.ceil(total_bits / 8))
+
+
+def _split_model(model):
+    """Return (preprocessing, XGBRegressor) for a Pipeline, or (None, model) for a bare regressor"""
+    if isinstance(model, Pipeline):
+        return model[:-1], model[-1]
+    return None, model
+
+
+def _get_regressor(model):
+    return _split_model(model)[1]
+
+
+def _with_booster(model, booster):
+    """Copy of the model (pipeline or regressor) with the booster of its regressor replaced"""
+    preprocessing, regressor = _split_model(model)
+
+    # The boosting rounds of the new booster don't line up with the original's, and xgboost < 2 predicts with
+    # best_ntree_limit rounds when it is set (every model fitted with an eval set has it), past the last kept tree
+    booster.set_attr(best_iteration = None, best_ntree_limit = None, best_score = None)
+
+    new_regressor = clone(regressor).set_params(n_estimators = booster.num_boosted_rounds())
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.json')
+        booster.save_model(path)
+        new_regressor.load_model(path)
+
+    if preprocessing is None:
+        return new_regressor
+
+    return Pipeline(preprocessing.steps + [(model.steps[-1][0], new_regressor)])
+
+
+def _booster_json(booster) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.json')
+        booster.save_model(path)
+        with open(path) as file:
+            return json.load(file)
+
+
+def _booster_from_json(model_json) -> xgb.Booster:
+    booster = xgb.Booster()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.json')
+        with open(path, 'w') as file:
+            json.dump(model_json, file)
+        booster.load_model(path)
+
+    return booster
+
+
+def _keep_trees(gbtree, kept):
+    """Remove every tree that isn't in 'kept' from the 'model' section of a gbtree JSON model, one tree per round"""
+    gbtree['trees'] = [gbtree['trees'][i] for i in kept]
+    for new_id, tree in enumerate(gbtree['trees']):
+        tree['id'] = new_id
+
+    gbtree['tree_info'] = [gbtree['tree_info'][i] for i in kept]
+    gbtree['gbtree_model_param']['num_trees'] = str(len(kept))
+    if 'iteration_indptr' in gbtree:
+        gbtree['iteration_indptr'] = list(range(len(kept) + 1))
+
+
+def _set_leaf_values(tree, leaves, values):
+    """Set the values of the 'leaves' node ids of a JSON tree, leaf values are stored in both of these arrays"""
+    for key in ['split_conditions', 'base_weights']:
+        node_values = np.asarray(tree[key], dtype = np.float64)
+        node_values[leaves] = values
+        tree[key] = node_values.tolist()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,25 @@
+import os
+import pickle
+from inspect import signature
+
+import joblib
 import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 import pandas as pd
-from statsmodels.nonparametric.smoothers_lowess import lowess
 
+from sklearn.base import BaseEstimator, RegressorMixin, clone
 from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OrdinalEncoder, OneHotEncoder, StandardScaler
 
-from sklearn.model_selection import validation_curve, learning_curve
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import validation_curve, learning_curve, KFold
 
-# Add the residual plot from baseline_utils here
+from src.residual_utils import ResidualDiagnostics
+from src.category_encoding import CategoryCodeEncoder
 
 # Utility function for categorical encoding
-def make_categorical_encoding(category_levels, ord_cols, oh_cols, scaling_cols = ['yearsExperience', 'milesFromMetropolis']) -> ColumnTransformer:
+def make_categorical_encoding(category_levels, ord_cols, oh_cols, scaling_cols = ['yearsExperience', 'milesFromMetropolis'], use_codes = False, **code_kwargs):
     """Utility function to help make many column transformers for testing categorical encoding
     
     Parameters
@@ -21,8 +28,14 @@ def make_categorical_encoding(category_levels, ord_cols, oh_cols, scaling_cols =
     ord_cols : (list or None) The columns to perform ordinal encoding
     oh_cols : (list or None) The columns to perform one hot encoding
     scaling_cols : numeric columsn to feed into StandardScaler
+    use_codes : Return a CategoryCodeEncoder instead, which encodes integer category codes and outputs the same features
+        as float32 (or CSR). code_kwargs are passed to it, i.e. output = 'sparse', or dtype = np.uint8 with scaling_cols = []
+        and only the categorical columns in the input
     
     """
+    if use_codes:
+        return CategoryCodeEncoder(category_levels, ord_cols, oh_cols, scaling_cols, **code_kwargs)
+
     # Appending each step to the list makes it so that ordinal and one hot encoding are optional
     # setting the arguments for either ordinal or one hot encoding to None will not include that 
     # encoder from the output column transformer
@@ -40,9 +53,11 @@ def make_categorical_encoding(category_levels, ord_cols, oh_cols, scaling_cols =
 
 
 
-# Plot learning curve, wrapper for the sklearn learning_curve() function that plots the results
-def plot_learning_curve(model, X, y, scoring, fig_size = (8, 5), **kwargs) -> None:
-    """Calculate learning curve metrics and plot results
+# Learning and validation curves
+# Computing the curve data is kept separate from plotting, so that expensive curves can be cached with 'cache_path'
+# (or pickled manually) and re-plotted with plot_curve_data() without refitting any models.
+def learning_curve_data(model, X, y, scoring, train_sizes = np.linspace(0.1, 1.0, 5), cv = 5, warm_start = False, cache_path = None, **kwargs) -> dict:
+    """Calculate learning curve metrics
     
     Parameters:
     -----------
@@ -50,10 +65,104 @@ def plot_learning_curve(model, X, y, scoring, fig_size = (8, 5), **kwargs) -> No
     X : Feature matrix of training data
     y : Target vector of values
     scoring : Scoring metric to use, must be a valid sklearn scoring parameter
+    train_sizes : Relative sizes of the training set, as fractions of each training fold
+    cv : Number of cross validation folds
+    warm_start : Use incremental learning, the final estimator must implement partial_fit(). Each fold is fitted once by
+        feeding only the rows added at each training size, instead of refitting from scratch for every size. For a Pipeline
+        the preprocessing steps are fitted once per fold on the full training fold.
+    cache_path : Optional pickle file; the curve data is loaded from it if it was computed with the same arguments,
+        otherwise it is computed and written to it
+    kwargs : Extra keyword arguments are passed to the learning_curve() function (ignored when warm_start is used)
+    
+    Returns a dictionary of curve data to be used with plot_curve_data()
+    """
+    cache_key = _curve_cache_key(cache_path, 'learning_curve', model, X, y, scoring, train_sizes, cv, warm_start, kwargs)
+    cached = _load_curve_cache(cache_path, cache_key)
+    if cached is not None:
+        return cached
+
+    if warm_start:
+        sizes, train_scores, test_scores = _warm_start_learning_curve(model, X, y, scoring, train_sizes, cv)
+    else:
+        sizes, train_scores, test_scores = learning_curve(model, X, y, scoring = scoring, train_sizes = train_sizes, cv = cv, **kwargs)
+
+    curve_data = {
+        'title': 'Learning curve',
+        'x_label': 'Training set size',
+        'x_values': sizes,
+        'train_scores': train_scores,
+        'test_scores': test_scores,
+        'scoring': scoring
+    }
+    _save_curve_cache(curve_data, cache_path, cache_key)
+
+    return curve_data
+
+
+def validation_curve_data(model, X, y, param_name, param_range, scoring, cv = 5, method = 'auto', cache_path = None, **kwargs) -> dict:
+    """Calculate validation curve metrics
+    
+    Parameters:
+    -----------
+    model : Estimator that is compatible with sklearn validation_curve()
+    X : Feature matrix of training data
+    y : Target vector of values
+    param_name : Name of the parameter to vary, using the '<step>__<param>' format for pipelines
+    param_range : Values of the parameter to evaluate
+    scoring : Scoring metric to use, must be a valid sklearn scoring parameter
+    cv : Number of cross validation folds
+    method : {'auto', 'boosting_rounds', 'refit'}
+        'boosting_rounds' fits one model per fold with the largest number of estimators and scores every value in param_range
+        on a prefix of its trees (via iteration_range). Only valid when varying 'n_estimators' of an estimator that supports
+        iteration_range in predict() (i.e. XGBoost). 'refit' uses sklearn validation_curve(), refitting for each value.
+        'auto' picks 'boosting_rounds' when it is valid.
+    cache_path : Optional pickle file; the curve data is loaded from it if it was computed with the same arguments,
+        otherwise it is computed and written to it
+    kwargs : Extra keyword arguments are passed to the validation_curve() function (ignored for 'boosting_rounds')
+    
+    Returns a dictionary of curve data to be used with plot_curve_data()
+    """
+    if not method in ['auto', 'boosting_rounds', 'refit']:
+        raise ValueError("The 'method' argument must be one of: 'auto', 'boosting_rounds', 'refit'")
+
+    cache_key = _curve_cache_key(cache_path, 'validation_curve', model, X, y, param_name, param_range, scoring, cv, method, kwargs)
+    cached = _load_curve_cache(cache_path, cache_key)
+    if cached is not None:
+        return cached
+
+    supports_prefixes = _supports_boosting_prefixes(model, param_name)
+    if method == 'boosting_rounds' and not supports_prefixes:
+        raise ValueError("The 'boosting_rounds' method requires varying 'n_estimators' of an estimator that supports 'iteration_range' in predict()")
+
+    if method == 'refit' or not supports_prefixes:
+        train_scores, test_scores = validation_curve(model, X, y, param_name = param_name, param_range = param_range, scoring = scoring, cv = cv, **kwargs)
+    else:
+        train_scores, test_scores = _boosting_rounds_validation_curve(model, X, y, param_name, param_range, scoring, cv)
+
+    curve_data = {
+        'title': 'Validation curve',
+        'x_label': param_name,
+        'x_values': np.asarray(param_range),
+        'train_scores': train_scores,
+        'test_scores': test_scores,
+        'scoring': scoring
+    }
+    _save_curve_cache(curve_data, cache_path, cache_key)
+
+    return curve_data
+
+
+def plot_curve_data(curve_data: dict, fig_size = (8, 5)) -> None:
+    """Plot the output of learning_curve_data() or validation_curve_data()
+    
+    Parameters:
+    -----------
+    curve_data : Dictionary of curve data
     fig_size : Output size of the plot
-    kwargs : Extra keyword arguments are passed to the learning_curve() function
     """
-    sizes, train_scores, test_scores = learning_curve(model, X, y, scoring = scoring, **kwargs)
+    x_values = curve_data['x_values']
+    train_scores = curve_data['train_scores']
+    test_scores = curve_data['test_scores']
 
     # If all the scores are negative (using negative scoring metric in sklearn)
     # use the absolute value instead 
@@ -63,25 +172,41 @@ def plot_learning_curve(model, X, y, scoring, fig_size = (8, 5), **kwargs) -> No
 
     train_scores_mean = np.mean(train_scores, axis = 1)
     test_scores_mean = np.mean(test_scores, axis = 1)
-    train_std = np.std(train_scores, axis = 1)
-    test_std = np.std(test_scores, axis = 1)
+    train_scores_std = np.std(train_scores, axis = 1)
+    test_scores_std = np.std(test_scores, axis = 1)
 
     _, ax = plt.subplots(figsize = fig_size)
 
-    ax.plot(sizes, train_scores_mean, 'o-b', label = 'Train')
-    ax.plot(sizes, test_scores_mean, 'o-r', label = 'Test')
-    ax.fill_between(sizes, train_scores_mean - train_std, train_scores_mean + train_std, alpha = 0.2, color = 'b')
-    ax.fill_between(sizes, test_scores_mean - test_std, test_scores_mean + test_std, alpha = 0.2, color = 'r')
+    ax.plot(x_values, train_scores_mean, 'o-b', label = 'Train')
+    ax.plot(x_values, test_scores_mean, 'o-r', label = 'Test')
+    ax.fill_between(x_values, train_scores_mean - train_scores_std, train_scores_mean + train_scores_std, alpha = 0.2, color = 'b')
+    ax.fill_between(x_values, test_scores_mean - test_scores_std, test_scores_mean + test_scores_std, alpha = 0.2, color = 'r')
 
-    ax.set_xlabel('Training set size')
-    ax.set_ylabel(scoring)
+    ax.set_xlabel(curve_data['x_label'])
+    ax.set_ylabel(curve_data['scoring'])
 
-    plt.title("Learning curve")
+    plt.title(curve_data['title'])
     plt.legend(loc = 'best')
     plt.show()
 
 
-# Plot validation curve
+# Plot learning curve, wrapper for learning_curve_data() that plots the results
+def plot_learning_curve(model, X, y, scoring, fig_size = (8, 5), **kwargs) -> None:
+    """Calculate learning curve metrics and plot results
+    
+    Parameters:
+    -----------
+    model : Estimator that is compatible with sklearn learning_curve()
+    X : Feature matrix of training data
+    y : Target vector of values
+    scoring : Scoring metric to use, must be a valid sklearn scoring parameter
+    fig_size : Output size of the plot
+    kwargs : Extra keyword arguments are passed to learning_curve_data() (i.e. warm_start, cache_path)
+    """
+    plot_curve_data(learning_curve_data(model, X, y, scoring, **kwargs), fig_size = fig_size)
+
+
+# Plot validation curve, wrapper for validation_curve_data() that plots the results
 def plot_validation_curve(model, X, y, param_name, param_range, scoring, fig_size = (8, 5), **kwargs) -> None:
     """Calculate validation curve metrics and plot output
     
@@ -92,89 +217,130 @@ def plot_validation_curve(model, X, y, param_name, param_range, scoring, fig_siz
     y : Target vector of values
     scoring : Scoring metric to use, must be a valid sklearn scoring parameter
     fig_size : Output size of the plot
-    kwargs : Extra keyword arguments are passed to the validation_curve() function
+    kwargs : Extra keyword arguments are passed to validation_curve_data() (i.e. method, cache_path)
     """
-    train_scores, test_scores = validation_curve(model, X, y, param_name = param_name, param_range = param_range, scoring = scoring, **kwargs)
+    plot_curve_data(validation_curve_data(model, X, y, param_name, param_range, scoring, **kwargs), fig_size = fig_size)
 
-    # If all the scores are negative (using negative scoring metric in sklearn)
-    # use the absolute value instead 
-    if all([i < 0 for i in train_scores[0]]):
-        train_scores = np.abs(train_scores)
-        test_scores = np.abs(test_scores)
 
-    train_scores_mean = np.mean(train_scores, axis = 1)
-    test_scores_mean = np.mean(test_scores, axis = 1)
-    train_scores_std = np.std(train_scores, axis = 1)
-    test_scores_std = np.std(test_scores, axis = 1)
+def _split_final_estimator(model):
+    """Return (preprocessing, final estimator) for a Pipeline, or (None, model) for a bare estimator"""
+    if isinstance(model, Pipeline):
+        return model[:-1], model[-1]
+    return None, model
 
-    _, ax = plt.subplots(figsize = fig_size)
 
-    ax.plot(param_range, train_scores_mean, 'o-b', label = 'Train')
-    ax.plot(param_range, test_scores_mean, 'o-r', label = 'Test')
-    ax.fill_between(param_range, train_scores_mean - train_scores_std, train_scores_mean + train_scores_std, alpha = 0.2, color = 'b')
-    ax.fill_between(param_range, test_scores_mean - test_scores_std, test_scores_mean + test_scores_std, alpha = 0.2, color = 'r')
+def _supports_boosting_prefixes(model, param_name):
+    """Check if a validation curve over param_name can be computed from tree prefixes of a single model"""
+    if param_name.split('__')[-1] != 'n_estimators':
+        return False
 
-    ax.set_xlabel(param_name)
-    ax.set_ylabel(scoring)
+    _, estimator = _split_final_estimator(model)
+    predict = getattr(estimator, 'predict', None)
 
-    plt.title('Validation curve')
-    plt.legend(loc = 'best')
-    plt.show()
+    return predict is not None and 'iteration_range' in signature(predict).parameters
+
+
+class _BoostingPrefix(BaseEstimator, RegressorMixin):
+    """Scoring helper: predicts with only the first 'n_rounds' boosting rounds of a fitted estimator"""
+    def __init__(self, estimator, n_rounds):
+        self.estimator = estimator
+        self.n_rounds = n_rounds
+
+    def predict(self, X):
+        return self.estimator.predict(X, iteration_range = (0, self.n_rounds))
+
+
+def _boosting_rounds_validation_curve(model, X, y, param_name, param_range, scoring, cv):
+    """Fit once per fold with the largest number of rounds and score every prefix of the boosted trees"""
+    scorer = check_scoring(model, scoring = scoring)
+    param_range = [int(i) for i in param_range]
+    train_scores = np.zeros((len(param_range), cv))
+    test_scores = np.zeros((len(param_range), cv))
+
+    for fold, (train_idx, test_idx) in enumerate(KFold(n_splits = cv).split(X, y)):
+        fold_model = clone(model).set_params(**{param_name: max(param_range)})
+        fold_model.fit(X.iloc[train_idx], y.iloc[train_idx])
+
+        # Transform each fold once, rather than once per prefix
+        preprocessing, estimator = _split_final_estimator(fold_model)
+        X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+        if preprocessing is not None:
+            X_train, X_test = preprocessing.transform(X_train), preprocessing.transform(X_test)
+
+        for i, n_rounds in enumerate(param_range):
+            prefix = _BoostingPrefix(estimator, n_rounds)
+            train_scores[i, fold] = scorer(prefix, X_train, y.iloc[train_idx])
+            test_scores[i, fold] = scorer(prefix, X_test, y.iloc[test_idx])
+
+    return train_scores, test_scores
 
 
-def plot_residuals(true: str, preds: str, resids: pd.DataFrame, save_path = None):
+def _warm_start_learning_curve(model, X, y, scoring, train_sizes, cv):
+    """Learning curve for incremental estimators, calling partial_fit() with only the newly added rows at each size"""
+    preprocessing, estimator = _split_final_estimator(model)
+    if not hasattr(estimator, 'partial_fit'):
+        raise TypeError("warm_start requires an estimator (or final pipeline step) that implements partial_fit()")
+
+    scorer = check_scoring(estimator, scoring = scoring)
+    train_scores = np.zeros((len(train_sizes), cv))
+    test_scores = np.zeros((len(train_sizes), cv))
+
+    for fold, (train_idx, test_idx) in enumerate(KFold(n_splits = cv).split(X, y)):
+        X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+        y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
+
+        if preprocessing is not None:
+            fold_preprocessing = clone(preprocessing).fit(X_train, y_train)
+            X_train, X_test = fold_preprocessing.transform(X_train), fold_preprocessing.transform(X_test)
+
+        fold_estimator = clone(estimator)
+        sizes = (np.asarray(train_sizes) * len(train_idx)).astype(int)
+        previous_size = 0
+
+        for i, size in enumerate(sizes):
+            fold_estimator.partial_fit(X_train[previous_size:size], y_train.iloc[previous_size:size])
+            previous_size = size
+
+            train_scores[i, fold] = scorer(fold_estimator, X_train[:size], y_train.iloc[:size])
+            test_scores[i, fold] = scorer(fold_estimator, X_test, y_test)
+
+    return sizes, train_scores, test_scores
+
+
+def _curve_cache_key(cache_path, *arguments):
+    """Hash of the arguments of a curve, a cache computed with different ones (i.e. another model or data) is not used"""
+    if cache_path:
+        return joblib.hash(arguments)
+
+
+def _load_curve_cache(cache_path, cache_key):
+    """Curve data of the cache file if it was saved with 'cache_key', None otherwise"""
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as file:
+            cached = pickle.load(file)
+        if cached.get('cache_key') == cache_key:
+            return cached['curve_data']
+
+
+def _save_curve_cache(curve_data, cache_path, cache_key):
+    if cache_path:
+        with open(cache_path, 'wb') as file:
+            pickle.dump({'cache_key': cache_key, 'curve_data': curve_data}, file)
+
+
+def plot_residuals(true: str, preds: str, resids: pd.DataFrame, save_path = None, n_bins = 100):
     """plots residuals from a model. 
 
-    Makes 3 plots: resids vs fitted, scale-location, and histogram of residuals
+    Makes 3 plots: resids vs fitted, scale-location, and histogram of residuals.
+    The plots are drawn from binned aggregates (see ResidualDiagnostics), so this scales to millions of rows.
 
     Parameters:
     -----------
     true : name of the column that holds the true values
     preds : name of the column that holds the predicted values
     resids : dataframe which contains predicted and true values
+    n_bins : number of bins along each axis of the plots
     """
-    resids = resids.copy()
-
-    # Setup, figure, grid, and axes objects
-    fig, ax = plt.subplots(2,2, figsize=(10, 7), gridspec_kw = {'height_ratios': [2,3]})
-    grid_shape = (2,2)
-    resid_v_fitted = plt.subplot2grid(grid_shape, (0,0))
-    scale_location = plt.subplot2grid(grid_shape, (0,1))
-    resid_distn = plt.subplot2grid(grid_shape, (1,0), colspan = 2)
-    
-
-    # Residuals vs fitted
-    resids['residuals'] = resids[true] - resids[preds]
-    sns.scatterplot(x = preds, y = 'residuals', data = resids, alpha = 0.2, color = 'grey', ax = resid_v_fitted)
-    resid_v_fitted.axhline(resids['residuals'].mean(), color = 'blue')
-    resid_v_fitted.set_xlabel('Fitted Values')
-    resid_v_fitted.set_ylabel('Residuals')
-    resid_v_fitted.set_title('Residuals vs fitted')
-    
-    # Scale-Location
-    # standardize residuals
-    std_resids = (resids.residuals - resids.residuals.mean()) / resids.residuals.std()
-    std_resids = np.sqrt(std_resids.abs())
-    # fit loess curve
-    delta = 0.00005 * len(resids) # For computational efficiency, with lowess, on large data 
-    loess = lowess(std_resids, resids[preds], it = 0, delta = delta, return_sorted = False)
-    # plot
-    sns.scatterplot(x = resids[preds], y = std_resids, alpha = 0.2, color = 'grey', ax = scale_location)
-    sns.lineplot(x = resids[preds], y = loess, ci = None, color = "blue", ax = scale_location)
-    
-    scale_location.set_ylabel('$\sqrt{|Standardized Residuals|}$')
-    scale_location.set_xlabel('Fitted Values')
-    scale_location.set_title('Scale-Location')
-    
-    # Residual distribution
-    sns.histplot(x = 'residuals', data = resids, ax = resid_distn, color = 'grey')
-    resid_distn.set_title('Distribution')
-    resid_distn.set_ylabel('')
-    resid_distn.set_xlabel('Residuals')
-    
-    plt.tight_layout()
-
-    if save_path:
-        plt.savefig(save_path, bbox_inches = 'tight')
+    residuals = resids[true].to_numpy() - resids[preds].to_numpy()
 
-    plt.show()
\ No newline at end of file
+    ResidualDiagnostics(resids[preds], residuals, n_bins = n_bins).plot(save_path = save_path)
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
+
+
+class ResidualDiagnostics:
+    def __init__(self, fitted, residuals, n_bins = 100, quantiles = (0.1, 0.5, 0.9)):
+        """
+        Binned residual diagnostics that scale to millions of predictions.
+
+        Instead of scattering every point and smoothing with LOWESS, the fitted values are binned once and that
+        bin index is reused to build every aggregate with np.bincount:
+            - 2D counts of residuals vs fitted values, and of sqrt(|standardized residuals|) vs fitted values
+            - binned mean curves for both of the above
+            - binned quantile curves of the residuals, read off the cumulative 2D counts
+            - the residual histogram (the 2D counts summed over the fitted bins)
+
+        Plotting only uses these aggregates, so the figure size and render time are fixed by 'n_bins' and
+        do not depend on the number of rows. Rows where the fitted value or the residual is NaN or infinite are left out,
+        their number is kept in 'n_dropped'.
+
+        Parameters
+        ----------
+
+        fitted : array-like of predicted values
+        residuals : array-like of residuals (true - predicted), same length as fitted
+        n_bins : Number of bins along each axis
+        quantiles : Residual quantiles to compute per fitted value bin
+        """
+        fitted = np.asarray(fitted, dtype = np.float64)
+        residuals = np.asarray(residuals, dtype = np.float64)
+
+        if fitted.shape != residuals.shape:
+            raise ValueError("The 'fitted' and 'residuals' arguments must have the same length")
+
+        finite = np.isfinite(fitted) & np.isfinite(residuals)
+        self.n_dropped = int((~finite).sum())
+        if self.n_dropped:
+            fitted, residuals = fitted[finite], residuals[finite]
+        if len(residuals) < 2:
+            raise ValueError("At least 2 rows with finite fitted values and residuals are needed")
+
+        self.n_bins = n_bins
+        self.quantiles = quantiles
+        self.n_rows = len(residuals)
+        self.residual_mean = residuals.mean()
+        self.residual_std = residuals.std(ddof = 1)
+
+        # sqrt(|standardized residuals|) used in the scale-location plot
+        scale = np.sqrt(np.abs((residuals - self.residual_mean) / self.residual_std))
+
+        # Bin indices are computed once per axis and reused for every aggregate
+        self.fitted_edges, fitted_idx = ResidualDiagnostics._bin(fitted, n_bins)
+        self.residual_edges, residual_idx = ResidualDiagnostics._bin(residuals, n_bins)
+        self.scale_edges, scale_idx = ResidualDiagnostics._bin(scale, n_bins)
+
+        self.fitted_counts = np.bincount(fitted_idx, minlength = n_bins)
+        self.residual_counts_2d = np.bincount(fitted_idx * n_bins + residual_idx, minlength = n_bins ** 2).reshape(n_bins, n_bins)
+        self.scale_counts_2d = np.bincount(fitted_idx * n_bins + scale_idx, minlength = n_bins ** 2).reshape(n_bins, n_bins)
+        self.residual_hist = self.residual_counts_2d.sum(axis = 0)
+
+        # Binned mean curves, bins without any rows are left as NaN
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            self.residual_mean_curve = np.bincount(fitted_idx, weights = residuals, minlength = n_bins) / self.fitted_counts
+            self.scale_mean_curve = np.bincount(fitted_idx, weights = scale, minlength = n_bins) / self.fitted_counts
+
+        self.residual_quantile_curves = self._binned_quantiles()
+
+    @property
+    def fitted_centers(self):
+        return (self.fitted_edges[:-1] + self.fitted_edges[1:]) / 2
+
+    def summary(self) -> pd.Series:
+        """Summary statistics of the residuals, quantiles are approximated from the residual histogram"""
+        approx_quantiles = {f'{int(q * 100)}%': self._interpolate_quantile(self.residual_hist[None, :], q)[0] for q in [0.25, 0.5, 0.75]}
+
+        return pd.Series({
+            'count': self.n_rows,
+            'mean': self.residual_mean,
+            'std': self.residual_std,
+            'min': self.residual_edges[0],
+            **approx_quantiles,
+            'max': self.residual_edges[-1]
+        })
+
+    def plot(self, save_path = None):
+        """Makes 3 plots from the aggregates: resids vs fitted, scale-location, and histogram of residuals"""
+        fig, ax = plt.subplots(2,2, figsize=(10, 7), gridspec_kw = {'height_ratios': [2,3]})
+        grid_shape = (2,2)
+        resid_v_fitted = plt.subplot2grid(grid_shape, (0,0))
+        scale_location = plt.subplot2grid(grid_shape, (0,1))
+        resid_distn = plt.subplot2grid(grid_shape, (1,0), colspan = 2)
+
+        # Residuals vs fitted
+        self._plot_counts(resid_v_fitted, self.residual_edges, self.residual_counts_2d)
+        for q, curve in zip(self.quantiles, self.residual_quantile_curves):
+            resid_v_fitted.plot(self.fitted_centers, curve, color = 'orange', linestyle = '--', linewidth = 1)
+        resid_v_fitted.plot(self.fitted_centers, self.residual_mean_curve, color = 'blue')
+        resid_v_fitted.axhline(self.residual_mean, color = 'blue', linewidth = 0.5)
+        resid_v_fitted.set_xlabel('Fitted Values')
+        resid_v_fitted.set_ylabel('Residuals')
+        resid_v_fitted.set_title('Residuals vs fitted')
+
+        # Scale-Location
+        self._plot_counts(scale_location, self.scale_edges, self.scale_counts_2d)
+        scale_location.plot(self.fitted_centers, self.scale_mean_curve, color = 'blue')
+        scale_location.set_ylabel(r'$\sqrt{|Standardized Residuals|}$')
+        scale_location.set_xlabel('Fitted Values')
+        scale_location.set_title('Scale-Location')
+
+        # Residual distribution
+        resid_distn.stairs(self.residual_hist, self.residual_edges, fill = True, color = 'grey')
+        resid_distn.set_title('Distribution')
+        resid_distn.set_ylabel('')
+        resid_distn.set_xlabel('Residuals')
+
+        plt.tight_layout()
+
+        if save_path:
+            plt.savefig(save_path, bbox_inches = 'tight')
+
+        plt.show()
+
+    def _plot_counts(self, ax, y_edges, counts):
+        # Empty bins are masked so they are drawn as background
+        ax.pcolormesh(self.fitted_edges, y_edges, np.ma.masked_equal(counts.T, 0), cmap = 'Greys', norm = LogNorm(), shading = 'flat')
+
+    def _binned_quantiles(self):
+        """Approximate residual quantiles per fitted bin from the 2D counts"""
+        curves = []
+        for q in self.quantiles:
+            curve = self._interpolate_quantile(self.residual_counts_2d, q)
+            curves.append(np.where(self.fitted_counts > 0, curve, np.nan))
+
+        return curves
+
+    def _interpolate_quantile(self, counts, q):
+        """Quantile of each row of binned residual counts, linearly interpolated within the bin that contains it"""
+        cumulative = np.cumsum(counts, axis = 1)
+        target = q * cumulative[:, -1]
+
+        # first residual bin where the cumulative count reaches the quantile, for every row at once
+        idx = (cumulative < target[:, None]).sum(axis = 1).clip(max = self.n_bins - 1)
+        rows = np.arange(len(counts))
+        count_before = cumulative[rows, idx] - counts[rows, idx]
+
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            within_bin = np.nan_to_num((target - count_before) / counts[rows, idx])
+
+        width = self.residual_edges[1] - self.residual_edges[0]
+        return self.residual_edges[idx] + within_bin * width
+
+    @staticmethod
+    def _bin(values, n_bins):
+        """Equal width bin edges and the bin index of every value"""
+        low, high = values.min(), values.max()
+        width = (high - low) / n_bins or 1.0
+
+        edges = low + width * np.arange(n_bins + 1)
+        idx = ((values - low) / width).astype(np.intp)
+        np.clip(idx, 0, n_bins - 1, out = idx)
+
+        return edges, idx
@@ -0,0 +1,166 @@
+"""
+Out-of-core training of the deployed XGBoost pipeline, for datasets that are larger than memory.
+
+The training file is read in chunks, every chunk goes through the fitted preprocessing and is handed to XGBoost
+through its data iterator interface. XGBoost builds its external memory pages from the iterator and caches them on
+disk in '--cache-dir', so only one chunk and the pages in use are held in memory at a time. The trained booster is
+wrapped back into the same Pipeline([('categorical_encoding', ...), ('xgb', XGBRegressor)]) that the API loads.
+
+Requires xgboost 1.5 or later (xgboost.DataIter with a 'cache_prefix').
+
+Usage (after 'pip install -e .'):
+    train-salary-model <train.csv|train.parquet> <output.pkl> [--eval-data FILE] [--chunksize ROWS] [--cache-dir DIR]
+"""
+import os
+import sys
+import pickle
+import shutil
+import argparse
+
+import xgboost as xgb
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from sklearn.exceptions import NotFittedError
+from sklearn.preprocessing import OrdinalEncoder
+from sklearn.utils.validation import check_is_fitted
+from xgboost.sklearn import XGBRegressor
+
+from src.data_store import CATEGORY_LEVELS, FEATURE_COLUMNS, read_chunks
+
+# Hyperparameters of the deployed model, from notebooks/3.5-xgboost-model-improvement.ipynb
+DEPLOYED_XGB_PARAMS = {
+    'objective': 'reg:squarederror',
+    'tree_method': 'hist',
+    'n_estimators': 275,
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'min_child_weight': 200,
+    'colsample_bytree': 0.5,
+    'gamma': 0.0001
+}
+
+ORDINAL_COLS = ['jobType', 'degree', 'industry', 'major']
+
+
+def make_deployed_preprocessing():
+    """The preprocessing step of the deployed pipeline, with the categories given up front
+
+    OrdinalEncoder() sorts the categories it finds, so the alphabetically sorted fixed vocabularies give the same
+    codes as the deployed model, and any chunk can be used to fit it.
+    """
+    categories = [sorted(CATEGORY_LEVELS[col]) for col in ORDINAL_COLS]
+
+    return ColumnTransformer([('ordinal encoding', OrdinalEncoder(categories = categories), ORDINAL_COLS)], remainder = 'passthrough')
+
+
+def train_out_of_core(train_path, output_path = None, eval_path = None, preprocessing = None, xgb_params = None,
+                      target = 'salary', chunksize = 1_000_000, cache_dir = None, keep_cache = False, verbose = True):
+    """Train the XGBoost pipeline from a CSV or Parquet file without loading it into memory
+
+    Parameters
+    ----------
+    train_path : CSV or Parquet file with the model features and the target column
+    output_path : Optional .pkl file to save the fitted pipeline to
+    eval_path : Optional CSV or Parquet file streamed the same way, its RMSE is reported after every boosting round
+    preprocessing : Transformer applied to every chunk, defaults to make_deployed_preprocessing().
+        If it isn't fitted yet it is fitted on the first chunk, so the first chunk must contain every category level.
+    xgb_params : XGBRegressor parameters, defaults to DEPLOYED_XGB_PARAMS
+    target : Name of the target column
+    chunksize : Number of rows read and transformed at a time
+    cache_dir : Directory for the external memory cache, defaults to '<output_path>.cache' or './xgb_cache'
+    keep_cache : Keep the cache files after training, by default they are removed
+    verbose : Print the evaluation metric after every boosting round
+
+    Returns the fitted pipeline
+    """
+    xgb_params = {**DEPLOYED_XGB_PARAMS, **(xgb_params or {})}
+    preprocessing = preprocessing if preprocessing is not None else make_deployed_preprocessing()
+    preprocessing = _fit_on_first_chunk(preprocessing, train_path, chunksize)
+
+    if cache_dir is None:
+        cache_dir = output_path + '.cache' if output_path else 'xgb_cache'
+    os.makedirs(cache_dir, exist_ok = True)
+
+    # xgb.train() takes the number of rounds as an argument and the number of threads as 'nthread'
+    booster_params = {key: value for key, value in xgb_params.items() if key not in ['n_estimators', 'n_jobs']}
+    booster_params['nthread'] = xgb_params.get('n_jobs') or os.cpu_count()
+
+    try:
+        dtrain = xgb.DMatrix(_ChunkIterator(train_path, preprocessing, target, chunksize, os.path.join(cache_dir, 'train')))
+        evals = [(dtrain, 'train')]
+        if eval_path:
+            evals.append((xgb.DMatrix(_ChunkIterator(eval_path, preprocessing, target, chunksize, os.path.join(cache_dir, 'eval'))), 'eval'))
+
+        booster = xgb.train(booster_params, dtrain, num_boost_round = xgb_params['n_estimators'], evals = evals,
+                            verbose_eval = verbose)
+    finally:
+        if not keep_cache:
+            shutil.rmtree(cache_dir, ignore_errors = True)
+
+    # Wrap the booster in the sklearn estimator the deployed pipeline uses
+    regressor = XGBRegressor(**xgb_params)
+    regressor.load_model(booster.save_raw())
+    model = Pipeline([('categorical_encoding', preprocessing), ('xgb', regressor)])
+
+    if output_path:
+        with open(output_path, 'wb') as file:
+            pickle.dump(model, file)
+
+    return model
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Train the salary prediction pipeline from a file that is larger than memory')
+    parser.add_argument('train', help = 'CSV or Parquet file with the model features and the salary column')
+    parser.add_argument('output', help = 'Output .pkl file for the fitted pipeline')
+    parser.add_argument('--eval-data', default = None, help = 'CSV or Parquet file to report the RMSE on after every round')
+    parser.add_argument('--chunksize', type = int, default = 1_000_000, help = 'Rows read and transformed at a time')
+    parser.add_argument('--cache-dir', default = None, help = 'Directory for the external memory cache, defaults to <output>.cache')
+    parser.add_argument('--keep-cache', action = 'store_true', help = 'Do not remove the cache files after training')
+    parser.add_argument('--n-estimators', type = int, default = DEPLOYED_XGB_PARAMS['n_estimators'], help = 'Number of boosting rounds')
+    parser.add_argument('--quiet', action = 'store_true', help = 'Do not print the evaluation metric')
+    args = parser.parse_args(argv)
+
+    train_out_of_core(args.train, args.output, eval_path = args.eval_data, xgb_params = {'n_estimators': args.n_estimators},
+                      chunksize = args.chunksize, cache_dir = args.cache_dir, keep_cache = args.keep_cache, verbose = not args.quiet)
+
+
+class _ChunkIterator(xgb.DataIter):
+    """Streams the transformed chunks of a file to XGBoost, which calls next() until it returns 0 and reset() between passes"""
+
+    def __init__(self, path, preprocessing, target, chunksize, cache_prefix):
+        self.path = path
+        self.preprocessing = preprocessing
+        self.target = target
+        self.chunksize = chunksize
+        self._chunks = None
+        super().__init__(cache_prefix = cache_prefix)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self.reset()
+
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return 0
+
+        input_data(data = self.preprocessing.transform(chunk[FEATURE_COLUMNS]), label = chunk[self.target].to_numpy())
+        return 1
+
+    def reset(self):
+        self._chunks = read_chunks(self.path, self.chunksize, columns = FEATURE_COLUMNS + [self.target])
+
+
+def _fit_on_first_chunk(preprocessing, path, chunksize):
+    try:
+        check_is_fitted(preprocessing)
+    except NotFittedError:
+        first_chunk = next(read_chunks(path, chunksize, columns = FEATURE_COLUMNS))
+        preprocessing = clone(preprocessing).fit(first_chunk[FEATURE_COLUMNS])
+
+    return preprocessing
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data_store import CATEGORY_LEVELS
+from src.eda_utils import GroupedSalaryStats
+
+CATEGORY_COLS = list(CATEGORY_LEVELS)
+NUMERIC_COLS = ['yearsExperience', 'milesFromMetropolis']
+OUTPUT_COLUMNS = ['jobId', 'companyId'] + CATEGORY_COLS + NUMERIC_COLS + ['salary']
+
+# Numbering of the generated ids follows the format of the original data, i.e. JOB1362684407687
+FIRST_JOB_ID = 1362684407687
+N_COMPANIES = 63
+
+
+class SalaryProfile:
+    def __init__(self, cell_probs, cell_means, cell_noise_std, numeric_probs, numeric_diffs, company_probs):
+        """
+        Distributions used to generate synthetic salary data.
+
+        The categorical features are sampled jointly from the frequencies of every cell of the cross product of their
+        levels (so correlations such as 'major' being NONE for low degrees are kept). Salaries are generated the same way
+        BaselineModel predicts them: the average salary of the cell, plus the difference between the average salary of each
+        numeric value and the overall average, plus normally distributed noise with the leftover standard deviation of the cell.
+
+        Use SalaryProfile.from_data() to derive a profile from real data, or SalaryProfile.default() when the data isn't available.
+
+        Parameters
+        ----------
+
+        cell_probs : array with one axis per category column (in CATEGORY_LEVELS order), frequency of each combination of levels
+        cell_means : array with the same shape, average salary of each combination
+        cell_noise_std : array with the same shape, standard deviation of the noise added to each combination
+        numeric_probs : dictionary of numeric column -> frequency of each value, from 0 to the max value
+        numeric_diffs : dictionary of numeric column -> average salary of each value minus the overall average
+        company_probs : frequency of each company id
+        """
+        self.cell_probs = np.asarray(cell_probs, dtype = np.float64)
+        self.cell_means = np.asarray(cell_means, dtype = np.float64)
+        self.cell_noise_std = np.asarray(cell_noise_std, dtype = np.float64)
+        self.numeric_probs = {col: np.asarray(probs, dtype = np.float64) for col, probs in numeric_probs.items()}
+        self.numeric_diffs = {col: np.asarray(diffs, dtype = np.float64) for col, diffs in numeric_diffs.items()}
+        self.company_probs = np.asarray(company_probs, dtype = np.float64)
+
+        expected_shape = tuple(len(levels) for levels in CATEGORY_LEVELS.values())
+        if self.cell_probs.shape != expected_shape:
+            raise ValueError(f"The 'cell_probs' argument must have the shape {expected_shape}")
+
+    @classmethod
+    def from_data(cls, df, target = 'salary'):
+        """Derive a profile from a salary dataframe, using the grouped statistics of every category combination"""
+        stats = GroupedSalaryStats(df, CATEGORY_COLS, target = target)
+        counts = stats.cell_hist.sum(axis = -1)
+
+        # GroupedSalaryStats sorts the levels alphabetically, reorder every axis to the CATEGORY_LEVELS order
+        level_order = [stats.levels[col].get_indexer(levels) for col, levels in CATEGORY_LEVELS.items()]
+        if any((indexer < 0).any() for indexer in level_order):
+            raise ValueError("Every level of the category columns must be present in the data")
+        order = np.ix_(*level_order)
+        counts, sums, sumsq = counts[order], stats.cell_sum[order], stats.cell_sumsq[order]
+
+        overall_mean = sums.sum() / counts.sum()
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            cell_means = np.where(counts > 0, sums / counts, overall_mean)
+            cell_var = np.where(counts > 1, (sumsq - counts * cell_means ** 2) / (counts - 1), 0)
+
+        numeric_probs, numeric_diffs = {}, {}
+        numeric_var = 0
+        for col in NUMERIC_COLS:
+            values = df[col].to_numpy()
+            value_counts = np.bincount(values)
+            numeric_probs[col] = value_counts / len(values)
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                diffs = np.bincount(values, weights = df[target].to_numpy()) / value_counts - overall_mean
+            numeric_diffs[col] = np.nan_to_num(diffs)
+            numeric_var += np.sum(numeric_probs[col] * numeric_diffs[col] ** 2)
+
+        # The numeric effects account for part of the variance in each cell, the rest becomes noise
+        cell_noise_std = np.sqrt(np.maximum(cell_var - numeric_var, 1))
+
+        if 'companyId' in df.columns:
+            # Company ids are numbered COMP0, COMP1, ... sort them by number rather than alphabetically
+            company_freq = df['companyId'].value_counts(normalize = True)
+            company_probs = company_freq.iloc[np.argsort([int(i[len('COMP'):]) for i in company_freq.index])].to_numpy()
+        else:
+            company_probs = np.full(N_COMPANIES, 1 / N_COMPANIES)
+
+        return cls(counts / counts.sum(), cell_means, cell_noise_std, numeric_probs, numeric_diffs, company_probs)
+
+    @classmethod
+    def default(cls):
+        """A hand specified profile that approximates the original data (average salary of $116k, see the README and EDA notebook)"""
+        level_effects = {
+            'jobType': [-45, -21, -11, -1, 9, 19, 19, 29],
+            'degree': [-6, -3, 4, 7, 10],
+            'major': [-6, 4, 2, 4, 6, 6, 8, 10, 12],
+            'industry': [-17, -12, -7, -1, 5, 14, 14]
+        }
+        # Pairs of (industry, major) with higher salaries, from the EDA
+        industry_major_bonus = {
+            'SERVICE': ['BUSINESS'], 'AUTO': ['ENGINEERING'], 'HEALTH': ['CHEMISTRY', 'BIOLOGY'],
+            'WEB': ['ENGINEERING', 'MATH', 'PHYSICS'], 'FINANCE': ['BUSINESS', 'ENGINEERING'], 'OIL': ['BUSINESS', 'ENGINEERING']
+        }
+
+        grids = np.meshgrid(*[np.asarray(effects, dtype = np.float64) for effects in level_effects.values()], indexing = 'ij')
+        cell_means = 116 + sum(grids)
+        for industry, majors in industry_major_bonus.items():
+            for major in majors:
+                cell_means[:, :, CATEGORY_LEVELS['major'].index(major), CATEGORY_LEVELS['industry'].index(industry)] += 6
+
+        # Jobs without a college degree have no major, a few with a degree list no major
+        degree_probs = np.array([0.236, 0.236, 0.176, 0.176, 0.176])
+        major_given_degree = np.zeros((5, 9))
+        major_given_degree[:2, 0] = 1
+        major_given_degree[2:, 0] = 0.115
+        major_given_degree[2:, 1:] = (1 - 0.115) / 8
+
+        cell_probs = (np.full(8, 1 / 8)[:, None, None, None]
+                      * (degree_probs[:, None] * major_given_degree)[None, :, :, None]
+                      * np.full(7, 1 / 7)[None, None, None, :])
+
+        numeric_probs = {'yearsExperience': np.full(25, 1 / 25), 'milesFromMetropolis': np.full(100, 1 / 100)}
+        numeric_diffs = {'yearsExperience': 2.0 * (np.arange(25) - 12), 'milesFromMetropolis': -0.4 * (np.arange(100) - 49.5)}
+
+        # Noise grows with the average salary, like the residuals of the trained models
+        cell_noise_std = 0.15 * cell_means
+
+        return cls(cell_probs, cell_means, cell_noise_std, numeric_probs, numeric_diffs, np.full(N_COMPANIES, 1 / N_COMPANIES))
+
+    def save(self, path):
+        """Save the profile to a .npz file"""
+        arrays = {
+            'cell_probs': self.cell_probs,
+            'cell_means': self.cell_means,
+            'cell_noise_std': self.cell_noise_std,
+            'company_probs': self.company_probs
+        }
+        for col in NUMERIC_COLS:
+            arrays[f'{col}_probs'] = self.numeric_probs[col]
+            arrays[f'{col}_diffs'] = self.numeric_diffs[col]
+
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        arrays = np.load(path)
+
+        return cls(
+            arrays['cell_probs'], arrays['cell_means'], arrays['cell_noise_std'],
+            {col: arrays[f'{col}_probs'] for col in NUMERIC_COLS},
+            {col: arrays[f'{col}_diffs'] for col in NUMERIC_COLS},
+            arrays['company_probs']
+        )
+
+    def sample(self, n_rows, rng, first_id = FIRST_JOB_ID) -> pd.DataFrame:
+        """Generate a dataframe of 'n_rows' synthetic jobs, with the ids numbered from 'first_id'"""
+        shape = self.cell_probs.shape
+        cells = rng.choice(self.cell_probs.size, size = n_rows, p = self.cell_probs.ravel())
+        category_codes = np.unravel_index(cells, shape)
+
+        data = {
+            'jobId': pd.Series(np.arange(first_id, first_id + n_rows)).astype(str).radd('JOB').to_numpy(),
+            'companyId': pd.Categorical.from_codes(rng.choice(len(self.company_probs), size = n_rows, p = self.company_probs),
+                                                   categories = [f'COMP{i}' for i in range(len(self.company_probs))])
+        }
+        for col, codes in zip(CATEGORY_COLS, category_codes):
+            data[col] = pd.Categorical.from_codes(codes.astype(np.int8), categories = CATEGORY_LEVELS[col])
+
+        salary = self.cell_means.ravel()[cells] + rng.standard_normal(n_rows) * self.cell_noise_std.ravel()[cells]
+        for col in NUMERIC_COLS:
+            values = rng.choice(len(self.numeric_probs[col]), size = n_rows, p = self.numeric_probs[col])
+            data[col] = values.astype(np.uint8)
+            salary += self.numeric_diffs[col][values]
+
+        data['salary'] = np.clip(np.round(salary), 0, None).astype(np.int16)
+
+        return pd.DataFrame(data, columns = OUTPUT_COLUMNS)
+
+
+def generate_dataset(path, n_rows, profile = None, seed = 0, chunksize = 1_000_000, verbose = True):
+    """Stream a synthetic dataset to a CSV or Parquet file in chunks, so memory use only depends on 'chunksize'
+
+    The output is deterministic for a given seed and chunksize, since each chunk uses its own random generator seeded with (seed, chunk number)
+
+    Parameters
+    ----------
+
+    path : output .csv or .parquet file
+    n_rows : number of rows to generate
+    profile : SalaryProfile to sample from, defaults to SalaryProfile.default()
+    seed : random seed
+    chunksize : number of rows generated and written at a time
+    verbose : print progress after every chunk
+    """
+    profile = profile or SalaryProfile.default()
+    writer = None
+
+    try:
+        for chunk_number, start in enumerate(range(0, n_rows, chunksize)):
+            rng = np.random.default_rng([seed, chunk_number])
+            chunk = profile.sample(min(chunksize, n_rows - start), rng, first_id = FIRST_JOB_ID + start)
+
+            if path.endswith('.parquet'):
+                table = pa.Table.from_pandas(chunk, preserve_index = False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+            else:
+                chunk.to_csv(path, mode = 'w' if start == 0 else 'a', header = start == 0, index = False)
+
+            if verbose:
+                print(f"Generated {start + len(chunk)} of {n_rows} rows", flush = True)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Generate a synthetic salary dataset with the schema of the original data')
+    parser.add_argument('output', help = 'Output .csv or .parquet file')
+    parser.add_argument('--rows', type = int, default = 1_000_000, help = 'Number of rows to generate')
+    parser.add_argument('--seed', type = int, default = 0, help = 'Random seed')
+    parser.add_argument('--chunksize', type = int, default = 1_000_000, help = 'Rows generated and written at a time')
+    parser.add_argument('--profile', default = None, help = 'SalaryProfile .npz file, defaults to the built-in profile')
+    args = parser.parse_args(argv)
+
+    profile = SalaryProfile.load(args.profile) if args.profile else None
+    generate_dataset(args.output, args.rows, profile = profile, seed = args.seed, chunksize = args.chunksize)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
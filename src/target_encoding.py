@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.model_selection import KFold
+from sklearn.utils.validation import check_is_fitted
+
+
+class GroupTargetEncoder(BaseEstimator, TransformerMixin):
+    def __init__(self, groups, stats = ('mean',), smoothing = 0, n_splits = 5, shuffle = True, random_state = 0, dtype = np.float32):
+        """
+        Adds target statistics of groups of categories as features, i.e. the average salary of every jobType and
+        industry combination that BaselineModel predicts with.
+
+        Every group is coded as a single integer (the combined codes of its columns), so the statistics of all the
+        groups of a column combination are an array indexed by that code: means are built with one bincount, quantiles
+        with one sort by (group, target). Transforming is a gather from the arrays, groups that weren't seen in fit
+        (or have unknown categories) get the statistic of the whole training target.
+
+        The features are leak free when used in a Pipeline: fit_transform() (used by Pipeline.fit(), so by
+        cross_validate() in EvaluateModels) returns out-of-fold features, each row encoded with the statistics of the
+        other 'n_splits' - 1 folds, while transform() uses the statistics of all the data passed to fit(). The rows
+        are coded and sorted once, each fold only selects its rows from the sorted arrays.
+
+        The output is the input dataframe with the features appended, named '<col>_<col>_mean' and '<col>_<col>_q<percent>',
+        so it can be followed by make_categorical_encoding() (the features are in its passthrough columns):
+
+            Pipeline([
+                ('group_features', GroupTargetEncoder([['jobType', 'industry'], ['jobType', 'degree', 'major']], stats = ['mean', 0.25, 0.75])),
+                ('categorical_encoding', make_categorical_encoding(...)),
+                ('xgb', XGBRegressor(...))
+            ])
+
+        A pipeline pickled with this encoder needs src/target_encoding.py importable wherever it is loaded, the Docker
+        image copies it for the API.
+
+        Parameters
+        ----------
+
+        groups : list of column combinations to group by, each a list of columns (or a single column name)
+        stats : statistics of the target for every group, 'mean' or a quantile between 0 and 1
+        smoothing : weight (in rows) of the overall statistic blended into every group's statistic, so groups with few
+            rows are pulled towards it. 0 uses the group statistics as they are
+        n_splits : number of folds of the out-of-fold features in fit_transform()
+        shuffle : shuffle the rows before splitting them into folds
+        random_state : seed of the fold shuffling
+        dtype : dtype of the added features
+        """
+        self.groups = groups
+        self.stats = stats
+        self.smoothing = smoothing
+        self.n_splits = n_splits
+        self.shuffle = shuffle
+        self.random_state = random_state
+        self.dtype = dtype
+
+    def fit(self, X: pd.DataFrame, y):
+        self._fit_vocabularies(X)
+        y = np.asarray(y, dtype = np.float64)
+
+        column_codes = self._column_codes(X)
+        self.tables_ = []
+        for cols in self.groups_:
+            sorted_codes, sorted_y, _ = self._sorted_groups(column_codes, cols, y)
+            self.tables_.append(self._table(sorted_codes, sorted_y, self._n_codes(cols)))
+
+        return self
+
+    def fit_transform(self, X: pd.DataFrame, y = None, **fit_params):
+        """Fit on all the rows, and return the out-of-fold features of the rows"""
+        self._fit_vocabularies(X)
+        y = np.asarray(y, dtype = np.float64)
+
+        random_state = self.random_state if self.shuffle else None
+        folds = list(KFold(self.n_splits, shuffle = self.shuffle, random_state = random_state).split(X))
+        features = np.empty((len(X), len(self.feature_names_)), dtype = self.dtype)
+        n_stats = len(self.stats)
+
+        column_codes = self._column_codes(X)
+        self.tables_ = []
+        for i, cols in enumerate(self.groups_):
+            sorted_codes, sorted_y, order = self._sorted_groups(column_codes, cols, y)
+            codes = np.empty_like(sorted_codes)
+            codes[order] = sorted_codes
+            self.tables_.append(self._table(sorted_codes, sorted_y, self._n_codes(cols)))
+
+            for train_index, test_index in folds:
+                in_train = np.zeros(len(y), dtype = bool)
+                in_train[train_index] = True
+                # Selecting the fold's rows from the sorted arrays keeps them sorted by (group, target)
+                in_train = in_train[order]
+
+                table = self._table(sorted_codes[in_train], sorted_y[in_train], self._n_codes(cols))
+                features[test_index, i * n_stats:(i + 1) * n_stats] = table[codes[test_index]]
+
+        return self._output(X, features)
+
+    def transform(self, X: pd.DataFrame):
+        check_is_fitted(self, 'tables_')
+
+        column_codes = self._column_codes(X)
+        features = np.empty((len(X), len(self.feature_names_)), dtype = self.dtype)
+        n_stats = len(self.stats)
+        for i, (cols, table) in enumerate(zip(self.groups_, self.tables_)):
+            features[:, i * n_stats:(i + 1) * n_stats] = table[self._group_codes(column_codes, cols)]
+
+        return self._output(X, features)
+
+    def get_feature_names(self):
+        """Names of the added features, the output also has every input column before them"""
+        check_is_fitted(self, 'feature_names_')
+        return list(self.feature_names_)
+
+    def _fit_vocabularies(self, X):
+        for stat in self.stats:
+            if stat != 'mean' and not (isinstance(stat, (float, int)) and 0 <= stat <= 1):
+                raise ValueError(f"The 'stats' argument must only have 'mean' or quantiles between 0 and 1, got {stat!r}")
+
+        if self.smoothing < 0:
+            raise ValueError("The 'smoothing' argument must be 0 or greater")
+
+        self.groups_ = [[cols] if isinstance(cols, str) else list(cols) for cols in self.groups]
+        columns = list(dict.fromkeys(col for cols in self.groups_ for col in cols))
+        self.vocabularies_ = {col: _vocabulary(X[col]) for col in columns}
+
+        self.quantiles_ = [stat for stat in self.stats if stat != 'mean']
+        self.feature_names_ = [f"{'_'.join(cols)}_{_stat_name(stat)}" for cols in self.groups_ for stat in self.stats]
+        self.n_features_in_ = X.shape[1]
+
+    def _sorted_groups(self, column_codes, cols, y):
+        """Group codes and target sorted by (code, target), and the sort order. Means don't need sorted rows, so the
+        rows are kept in order when no quantiles are computed"""
+        codes = self._group_codes(column_codes, cols)
+        order = np.lexsort((y, codes)) if self.quantiles_ else np.arange(len(codes))
+
+        return codes[order], y[order], order
+
+    def _n_codes(self, cols):
+        return int(np.prod([len(self.vocabularies_[col]) for col in cols]))
+
+    def _column_codes(self, X):
+        """Integer codes of every column used by the groups, each column is coded once for all of its groups"""
+        return {col: _category_codes(X[col], vocabulary) for col, vocabulary in self.vocabularies_.items()}
+
+    def _group_codes(self, column_codes, cols):
+        """Combined integer code of the group of every row, -1 when any of its categories is unknown"""
+        n_rows = len(column_codes[cols[0]])
+        combined = np.zeros(n_rows, dtype = np.int64)
+        unknown = np.zeros(n_rows, dtype = bool)
+        for col in cols:
+            codes = column_codes[col]
+            combined = combined * len(self.vocabularies_[col]) + codes
+            unknown |= codes < 0
+
+        combined[unknown] = -1
+        return combined
+
+    def _table(self, codes, y, n_codes):
+        """Statistics of every group code, with one more row for unknown groups (the code -1)
+
+        'codes' and 'y' must be sorted by (code, target) when quantiles are computed.
+        """
+        known = codes >= 0
+        if not known.all():
+            # Rows with missing categories don't belong to any group
+            codes, y = codes[known], y[known]
+
+        counts = np.bincount(codes, minlength = n_codes)
+        # Groups without rows have a weight of 0, so they get the overall statistic
+        weight = (counts / np.maximum(counts + self.smoothing, 1))[:, None]
+
+        table = np.empty((n_codes + 1, len(self.stats)), dtype = np.float64)
+        group_values = np.empty((n_codes, len(self.stats)), dtype = np.float64)
+        overall = np.empty(len(self.stats), dtype = np.float64)
+
+        if 'mean' in self.stats:
+            position = list(self.stats).index('mean')
+            group_values[:, position] = np.bincount(codes, weights = y, minlength = n_codes) / np.maximum(counts, 1)
+            overall[position] = y.mean()
+
+        if self.quantiles_:
+            # y is sorted within each group, a group's quantile interpolates between two of its sorted values
+            starts = np.cumsum(counts) - counts
+            last = max(len(y) - 1, 0)
+            for position, stat in enumerate(self.stats):
+                if stat == 'mean':
+                    continue
+                rank = stat * np.maximum(counts - 1, 0)
+                lower = np.floor(rank).astype(np.int64)
+                fraction = rank - lower
+                low_values = y[np.clip(starts + lower, 0, last)]
+                high_values = y[np.clip(starts + np.minimum(lower + 1, counts - 1), 0, last)]
+                group_values[:, position] = low_values + fraction * (high_values - low_values)
+                overall[position] = np.quantile(y, stat)
+
+        table[:-1] = weight * group_values + (1 - weight) * overall
+        table[-1] = overall
+
+        return table.astype(self.dtype)
+
+    def _output(self, X, features):
+        return pd.concat([X, pd.DataFrame(features, columns = self.feature_names_, index = X.index)], axis = 1)
+
+
+def _vocabulary(values: pd.Series) -> pd.Index:
+    """Levels of a column: the categories of a pandas Categorical column, otherwise its sorted unique values"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return pd.Index(values.cat.categories)
+
+    return pd.Index(np.sort(values.dropna().unique()))
+
+
+def _category_codes(values: pd.Series, vocabulary: pd.Index) -> np.ndarray:
+    """Integer codes of the values in the vocabulary, -1 for values that aren't in it"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Re-map the column's own codes, the lookup array is only as long as its categories
+        lookup = np.append(vocabulary.get_indexer(values.cat.categories), -1)
+        return lookup[values.cat.codes.to_numpy()].astype(np.int64)
+
+    return vocabulary.get_indexer(values).astype(np.int64)
+
+
+def _stat_name(stat):
+    return 'mean' if stat == 'mean' else f'q{stat * 100:g}'
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The tests import the project's src and benchmarks packages, and the api modules by name like api/app.py does
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PROJECT_DIR)
@@ -0,0 +1,65 @@
+import os
+import sys
+import pickle
+import importlib
+
+import pytest
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+
+from src.data_store import CATEGORY_LEVELS
+from src.model_utils import make_categorical_encoding
+from src.target_encoding import GroupTargetEncoder
+from benchmarks.common import API_DIR, make_features
+
+CATEGORY_COLUMNS = ['jobType', 'degree', 'major', 'industry']
+
+
+@pytest.fixture
+def group_features_app(tmp_path, monkeypatch):
+    """api/app.py serving a pipeline that starts with a GroupTargetEncoder"""
+    X, y = make_features(n_rows = 2000)
+    model = Pipeline([
+        ('group_features', GroupTargetEncoder([['jobType', 'industry']], stats = ['mean', 0.5])),
+        ('categorical_encoding', make_categorical_encoding([CATEGORY_LEVELS[col] for col in CATEGORY_COLUMNS], CATEGORY_COLUMNS, [])),
+        ('xgb', XGBRegressor(n_estimators = 10, max_depth = 3))
+    ]).fit(X, y)
+
+    model_path = tmp_path / 'model.pkl'
+    with open(model_path, 'wb') as file:
+        pickle.dump(model, file)
+
+    monkeypatch.setenv('MODEL_PATH', str(model_path))
+    monkeypatch.setenv('DRIFT_PROFILE', str(tmp_path / 'missing_profile.json'))
+    monkeypatch.setenv('FALLBACK_MODEL', str(tmp_path / 'missing_fallback.npz'))
+    monkeypatch.delenv('CAPTURE_DIR', raising = False)
+    monkeypatch.delenv('PRECOMPUTE_EXPLANATIONS', raising = False)
+    monkeypatch.chdir(API_DIR)
+    monkeypatch.syspath_prepend(API_DIR)
+    monkeypatch.delitem(sys.modules, 'app', raising = False)
+
+    app_module = importlib.import_module('app')
+    yield app_module, X.iloc[:5]
+    sys.modules.pop('app', None)
+
+
+def test_app_serves_group_target_pipeline(group_features_app):
+    app_module, jobs = group_features_app
+    client = app_module.app.test_client()
+    records = jobs.to_dict(orient = 'records')
+
+    single = client.post('/single-prediction', json = records[0])
+    assert single.status_code == 200
+    assert len(single.get_json()['message']) == 1
+
+    multiple = client.post('/multiple-prediction', json = [dict(job, id = i) for i, job in enumerate(records)])
+    assert multiple.status_code == 200
+    assert len(multiple.get_json()['message']) == len(records)
+
+    # The category levels are read from the ColumnTransformer, which isn't the first step
+    app_module.drift_monitor.wait_until_idle()
+    assert set(app_module.drift_monitor.categories) == set(CATEGORY_COLUMNS)
+    assert client.get('/drift-report').get_json()['message']['rows_seen'] == 1 + len(records)
+
+    assert app_module.explanations is None
+    assert client.post('/explain-prediction', json = records[0]).status_code == 501
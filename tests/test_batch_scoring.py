@@ -0,0 +1,67 @@
+import os
+import json
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.dummy import DummyRegressor
+from sklearn.pipeline import Pipeline
+
+from src.batch_scoring import score_file, MANIFEST_NAME, PREDICTION_COL, _run_manifest
+from benchmarks.common import make_data
+
+
+@pytest.fixture
+def scoring_files(tmp_path):
+    """Input parquet file with 1000 jobs, a pickled pipeline predicting a constant salary and the output path"""
+    input_path = str(tmp_path / 'jobs.parquet')
+    make_data(n_rows = 1000).to_parquet(input_path, index = False)
+
+    model_path = str(tmp_path / 'model.pkl')
+    model = Pipeline([('constant', DummyRegressor(strategy = 'constant', constant = 100.0))])
+    with open(model_path, 'wb') as file:
+        pickle.dump(model.fit(np.zeros((1, 1)), [100.0]), file)
+
+    return input_path, model_path, str(tmp_path / 'scores.parquet')
+
+
+def _interrupted_run(input_path, model_path, output_path, chunksize, write_manifest = True):
+    """Shard directory of a run with 'chunksize' that was stopped after scoring its first shard"""
+    shard_dir = output_path + '.shards'
+    os.makedirs(shard_dir)
+
+    first_shard = pd.read_parquet(input_path, columns = ['jobId']).iloc[:chunksize]
+    first_shard[PREDICTION_COL] = np.float32(100.0)
+    first_shard.to_parquet(os.path.join(shard_dir, 'shard-000000.parquet'), index = False)
+
+    if write_manifest:
+        with open(os.path.join(shard_dir, MANIFEST_NAME), 'w') as file:
+            json.dump(_run_manifest(input_path, model_path, 'jobId', chunksize), file)
+
+
+def test_resume_keeps_the_shards_of_the_same_run(scoring_files):
+    input_path, model_path, output_path = scoring_files
+    _interrupted_run(input_path, model_path, output_path, chunksize = 300)
+
+    summary = score_file(input_path, output_path, model_path = model_path, chunksize = 300, workers = 1, resume = True, verbose = False)
+
+    output = pd.read_parquet(output_path)
+    assert summary['rows_scored'] == 700
+    assert output.jobId.tolist() == pd.read_parquet(input_path, columns = ['jobId']).jobId.tolist()
+
+
+def test_resume_refuses_the_shards_of_another_chunksize(scoring_files):
+    input_path, model_path, output_path = scoring_files
+    _interrupted_run(input_path, model_path, output_path, chunksize = 300)
+
+    with pytest.raises(ValueError, match = 'chunksize'):
+        score_file(input_path, output_path, model_path = model_path, chunksize = 250, workers = 1, resume = True, verbose = False)
+
+
+def test_resume_refuses_shards_without_a_manifest(scoring_files):
+    input_path, model_path, output_path = scoring_files
+    _interrupted_run(input_path, model_path, output_path, chunksize = 300, write_manifest = False)
+
+    with pytest.raises(ValueError, match = MANIFEST_NAME):
+        score_file(input_path, output_path, model_path = model_path, chunksize = 300, workers = 1, resume = True, verbose = False)
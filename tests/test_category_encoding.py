@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from src.data_store import CATEGORY_LEVELS
+from src.model_utils import make_categorical_encoding
+from benchmarks.common import make_features
+
+CATEGORY_COLUMNS = ['jobType', 'degree', 'major', 'industry']
+
+
+def test_uint8_output_with_scaled_columns_raises():
+    X, _ = make_features(n_rows = 100)
+    encoding = make_categorical_encoding([CATEGORY_LEVELS['jobType']], ['jobType'], ['degree', 'major', 'industry'], use_codes = True, dtype = np.uint8)
+
+    with pytest.raises(ValueError, match = 'integer'):
+        encoding.fit(X)
+
+
+def test_uint8_output_with_remainder_columns_raises():
+    X, _ = make_features(n_rows = 100)
+    encoding = make_categorical_encoding([CATEGORY_LEVELS['jobType']], ['jobType'], ['degree', 'major', 'industry'], scaling_cols = [], use_codes = True, dtype = np.uint8)
+
+    with pytest.raises(ValueError, match = 'yearsExperience'):
+        encoding.fit(X)
+
+
+def test_uint8_output_matches_float_output_for_categorical_columns():
+    X, _ = make_features(n_rows = 500)
+    X = X[CATEGORY_COLUMNS]
+    kwargs = dict(
+        category_levels = [CATEGORY_LEVELS['jobType']], ord_cols = ['jobType'], oh_cols = ['degree', 'major', 'industry'], scaling_cols = [],
+        use_codes = True, output = 'dense'
+    )
+
+    uint8_features = make_categorical_encoding(dtype = np.uint8, **kwargs).fit_transform(X)
+    float_features = make_categorical_encoding(**kwargs).fit_transform(X)
+
+    assert uint8_features.dtype == np.uint8
+    np.testing.assert_array_equal(uint8_features, float_features)
+    # The column transformer returns a sparse matrix at this density
+    column_transformer_features = make_categorical_encoding(**{**kwargs, 'use_codes': False}).fit_transform(X)
+    np.testing.assert_array_equal(float_features, column_transformer_features.toarray())
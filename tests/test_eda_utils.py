@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.eda_utils import GroupedSalaryStats, make_correlation_plot
+from benchmarks.common import make_data
+
+
+@pytest.fixture(scope = 'module')
+def data():
+    return make_data(n_rows = 2000)
+
+
+def test_encode_matches_the_groupby_median(data):
+    stats = GroupedSalaryStats(data, ['jobType', 'industry'])
+    expected = data.jobType.map(data.groupby('jobType').salary.median())
+
+    np.testing.assert_array_equal(stats.encode('jobType', df = data), expected.to_numpy())
+
+
+@pytest.mark.parametrize('change', ['filtered', 'shuffled'])
+def test_stats_of_other_rows_raise(data, change):
+    stats = GroupedSalaryStats(data, ['jobType', 'industry'])
+    other = data.iloc[:1000] if change == 'filtered' else data.sample(frac = 1, random_state = 0)
+
+    with pytest.raises(ValueError):
+        stats.encode('jobType', df = other)
+
+    with pytest.raises(ValueError):
+        make_correlation_plot(other[['jobType', 'industry', 'salary']], ['jobType', 'industry'], stats = stats)
+
+
+def test_too_many_histogram_bins_raise_before_allocating(data):
+    # 2000 distinct values in each numeric column give billions of bins
+    numeric = data.assign(a = np.arange(len(data)), b = np.arange(len(data)), c = np.arange(len(data)))
+
+    with pytest.raises(ValueError, match = 'MAX_HISTOGRAM_BINS'):
+        GroupedSalaryStats(numeric, ['jobType', 'a', 'b', 'c'])
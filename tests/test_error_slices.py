@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from src.error_slices import ErrorSlices
+
+
+def test_missing_values_are_left_out_of_the_slices():
+    data = pd.DataFrame({
+        'jobType': ['CEO', 'CEO', None, 'JANITOR', 'JANITOR', 'CEO'],
+        'degree': ['NONE', np.nan, 'MASTERS', 'NONE', 'MASTERS', 'MASTERS'],
+        'final_residuals': [1.0, 10.0, -10.0, 0.0, -1.0, 2.0]
+    })
+
+    slices = ErrorSlices(data, threshold = 5, features = ['jobType', 'degree']).slices
+    single = slices.loc[slices.feature_2.isna()].set_index(['feature_1', 'value_1'])
+    pair = slices.loc[slices.feature_2.notna()].set_index(['value_1', 'value_2'])
+
+    # Same groups as a groupby, which drops the missing values
+    expected = data.groupby('jobType').final_residuals.agg(['count', 'mean'])
+    np.testing.assert_array_equal(single.loc['jobType', 'count'].to_numpy(), expected['count'].to_numpy())
+    np.testing.assert_allclose(single.loc['jobType', 'mean_residual'].to_numpy(), expected['mean'].to_numpy())
+
+    expected = data.groupby(['jobType', 'degree']).final_residuals.agg(['count', 'mean'])
+    assert sorted(pair.index) == sorted(expected.index)
+    np.testing.assert_allclose(pair.loc[expected.index, 'mean_residual'].to_numpy(), expected['mean'].to_numpy())
+
+    # The support is still a fraction of every row
+    assert single.loc[('jobType', 'CEO'), 'support'] == 3 / 6
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.dummy import DummyRegressor
+
+from src.EvaluateModels import EvaluateModels, EvaluatePipelines
+
+
+class _AllocatingRegressor(BaseEstimator, RegressorMixin):
+    """Predicts the mean, and touches 'allocate_mb' of memory while fitting"""
+    def __init__(self, allocate_mb = 200):
+        self.allocate_mb = allocate_mb
+
+    def fit(self, X, y):
+        buffer = np.ones(self.allocate_mb * 1_000_000 // 8)
+        self.mean_ = float(np.mean(y)) + buffer[0] - 1
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.mean_)
+
+
+def _data(n_rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'x': rng.normal(size = n_rows)}), pd.Series(rng.normal(size = n_rows))
+
+
+def test_profile_cross_validate_counts_memory_allocated_during_fit():
+    X, y = _data(1000)
+    evaluator = EvaluatePipelines(pipelines = [], scoring = 'neg_mean_squared_error')
+
+    cv_values, _ = evaluator.profile_cross_validate(_AllocatingRegressor(allocate_mb = 200), X, y, cv = 2)
+
+    assert (cv_values['peak_fit_memory_mb'] > 150).all()
+
+
+def test_profile_inference_skips_batch_sizes_larger_than_the_data():
+    X, y = _data(500)
+    model = DummyRegressor().fit(X, y)
+
+    profile = EvaluateModels.profile_inference(model, X, batch_sizes = (1, 100, 10_000), n_repeats = 5)
+
+    assert 'throughput_100' in profile
+    assert 'throughput_10000' not in profile
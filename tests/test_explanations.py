@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+
+from src.data_store import CATEGORY_LEVELS
+from src.model_utils import make_categorical_encoding
+from benchmarks.common import API_DIR, make_features
+
+
+@pytest.fixture
+def explanations(monkeypatch):
+    monkeypatch.syspath_prepend(API_DIR)
+    import explanations
+
+    return explanations
+
+
+@pytest.mark.parametrize('oh_cols', [[], ['degree', 'major', 'industry']])
+def test_contributions_sum_to_the_predictions(explanations, oh_cols):
+    X, y = make_features(n_rows = 3000)
+    ord_cols = [col for col in ['jobType', 'degree', 'major', 'industry'] if col not in oh_cols]
+    model = Pipeline([
+        ('categorical_encoding', make_categorical_encoding([CATEGORY_LEVELS[col] for col in ord_cols], ord_cols, oh_cols)),
+        ('xgb', XGBRegressor(n_estimators = 30, max_depth = 4))
+    ]).fit(X, y)
+
+    contributions = explanations.ContributionCache(model).explain(X.iloc[:200])
+
+    assert list(contributions.columns) == explanations.FEATURE_COLUMNS + ['bias']
+    np.testing.assert_allclose(contributions.sum(axis = 1), model.predict(X.iloc[:200]), rtol = 1e-4)
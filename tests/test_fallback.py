@@ -0,0 +1,36 @@
+import time
+
+import pytest
+
+from benchmarks.common import API_DIR
+
+
+@pytest.fixture
+def load_shedder(monkeypatch):
+    monkeypatch.syspath_prepend(API_DIR)
+    from fallback import LoadShedder
+
+    return LoadShedder(max_latency_ms = 50, probe_interval = 60, smoothing = 1.0)
+
+
+def test_large_request_does_not_shed_small_requests(load_shedder):
+    # 100ms for 1000 rows is 0.1ms per row
+    with load_shedder.track('multiple', n_rows = 1000):
+        time.sleep(0.1)
+
+    assert not load_shedder.use_fallback('single', n_rows = 1)
+    assert not load_shedder.use_fallback('multiple', n_rows = 10)
+    # An expected latency of 10s, after the probe of the model
+    assert not load_shedder.use_fallback('multiple', n_rows = 100_000)
+    assert load_shedder.use_fallback('multiple', n_rows = 100_000)
+    assert not load_shedder.use_fallback('multiple', n_rows = 10)
+
+
+def test_slow_requests_are_shed_until_probed(load_shedder):
+    with load_shedder.track('single'):
+        time.sleep(0.06)
+
+    # The first request after the threshold is crossed probes the model, the next ones go to the fallback
+    assert not load_shedder.use_fallback('single')
+    assert load_shedder.use_fallback('single')
+    assert not load_shedder.use_fallback('multiple', n_rows = 10)
@@ -0,0 +1,38 @@
+import pytest
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+
+from src.data_store import CATEGORY_LEVELS
+from src.model_utils import make_categorical_encoding
+from src.model_compression import make_variants, compare_variants, DEFAULT_MERGE_FRACTIONS
+from benchmarks.common import make_features
+
+CATEGORY_COLUMNS = ['jobType', 'degree', 'major', 'industry']
+
+
+@pytest.fixture(scope = 'module')
+def variant_report():
+    X, y = make_features(n_rows = 5000)
+    model = Pipeline([
+        ('categorical_encoding', make_categorical_encoding([CATEGORY_LEVELS[col] for col in CATEGORY_COLUMNS], CATEGORY_COLUMNS, [])),
+        ('xgb', XGBRegressor(n_estimators = 100, max_depth = 4, learning_rate = 0.1, tree_method = 'hist'))
+    ]).fit(X, y)
+
+    variants = make_variants(model, X, n_trees = (50,), leaf_bits = (4,))
+    return compare_variants(variants, X, y, batch_size = 1000, n_repeats = 2)
+
+
+def test_default_merge_variants_remove_trees(variant_report):
+    merged = variant_report.loc[variant_report.index.str.startswith('merge_correlation_')]
+
+    assert len(merged) == len(DEFAULT_MERGE_FRACTIONS)
+    assert (merged.n_trees < 100).all()
+    # A larger fraction of the trees is merged at every lower threshold
+    assert merged.n_trees.is_monotonic_decreasing
+
+
+def test_quantized_leaves_shrink_the_leaf_storage(variant_report):
+    original, quantized = variant_report.loc['original'], variant_report.loc['quantize_4_bit_leaves']
+
+    assert quantized.n_trees == original.n_trees
+    assert quantized.leaf_storage_kb < original.leaf_storage_kb
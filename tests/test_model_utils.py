@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge
+
+import src.model_utils
+from src.model_utils import validation_curve_data
+
+
+def _data(n_rows = 200):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({'x': rng.normal(size = n_rows)})
+    return X, 2 * X.x + rng.normal(size = n_rows)
+
+
+def _no_refit(*args, **kwargs):
+    raise AssertionError('The curve was recomputed')
+
+
+def test_curve_cache_is_reused_for_the_same_arguments(tmp_path, monkeypatch):
+    X, y = _data()
+    cache_path = str(tmp_path / 'curve.pkl')
+
+    first = validation_curve_data(Ridge(), X, y, 'alpha', [0.1, 1.0], 'r2', cv = 3, cache_path = cache_path)
+    monkeypatch.setattr(src.model_utils, 'validation_curve', _no_refit)
+    second = validation_curve_data(Ridge(), X, y, 'alpha', [0.1, 1.0], 'r2', cv = 3, cache_path = cache_path)
+
+    np.testing.assert_array_equal(first['test_scores'], second['test_scores'])
+
+
+def test_curve_cache_is_recomputed_when_the_arguments_change(tmp_path):
+    X, y = _data()
+    cache_path = str(tmp_path / 'curve.pkl')
+
+    validation_curve_data(Ridge(), X, y, 'alpha', [0.1, 1.0], 'r2', cv = 3, cache_path = cache_path)
+    other_range = validation_curve_data(Ridge(), X, y, 'alpha', [0.1, 1.0, 10.0], 'r2', cv = 3, cache_path = cache_path)
+    other_data = validation_curve_data(Ridge(), X, y.abs(), 'alpha', [0.1, 1.0, 10.0], 'r2', cv = 3, cache_path = cache_path)
+
+    assert other_range['test_scores'].shape == (3, 3)
+    assert not np.array_equal(other_range['train_scores'], other_data['train_scores'])
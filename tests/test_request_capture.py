@@ -0,0 +1,46 @@
+import os
+import time
+
+import pytest
+
+from benchmarks.common import API_DIR
+
+
+@pytest.fixture
+def request_capture(monkeypatch):
+    monkeypatch.syspath_prepend(API_DIR)
+    import request_capture
+
+    return request_capture
+
+
+def _capture_files(directory):
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))]
+
+
+def test_records_are_flushed_without_closing(request_capture, tmp_path):
+    capture = request_capture.RequestCapture(str(tmp_path))
+    capture.record('/single-prediction', b'{"jobType": "CEO"}', time.time(), 1.5)
+
+    # The writer thread flushes once the queue is empty, read the file while it is still open
+    deadline = time.time() + 5
+    records = []
+    while not records and time.time() < deadline:
+        time.sleep(0.01)
+        records = [record for path in _capture_files(str(tmp_path)) for record in request_capture.read_capture(path)]
+
+    assert [(endpoint, payload) for endpoint, _, _, payload in records] == [('/single-prediction', b'{"jobType": "CEO"}')]
+    capture.close()
+
+
+def test_close_writes_the_queued_records(request_capture, tmp_path):
+    capture = request_capture.RequestCapture(str(tmp_path))
+    for i in range(1000):
+        capture.record('/multiple-prediction', f'{{"id": {i}}}'.encode(), time.time(), 2.0)
+    capture.close()
+    capture.record('/single-prediction', b'{}', time.time(), 1.0)
+
+    records = [record for path in _capture_files(str(tmp_path)) for record in request_capture.read_capture(path)]
+
+    assert capture._file is None
+    assert len(records) == capture.captured_requests == 1000
@@ -0,0 +1,19 @@
+import numpy as np
+
+from src.residual_utils import ResidualDiagnostics
+
+
+def test_non_finite_rows_are_dropped():
+    rng = np.random.default_rng(0)
+    fitted = rng.normal(100, 20, size = 1000)
+    residuals = rng.normal(0, 5, size = 1000)
+    fitted[:3] = [np.nan, np.inf, 1.0]
+    residuals[2:4] = [np.nan, -np.inf]
+
+    diagnostics = ResidualDiagnostics(fitted, residuals, n_bins = 20)
+    finite = ResidualDiagnostics(fitted[4:], residuals[4:], n_bins = 20)
+
+    assert diagnostics.n_dropped == 4
+    assert diagnostics.n_rows == 996
+    np.testing.assert_array_equal(diagnostics.residual_counts_2d, finite.residual_counts_2d)
+    assert np.isfinite(diagnostics.summary()).all()
@@ -0,0 +1,44 @@
+import pickle
+
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+
+from src.data_store import FEATURE_COLUMNS
+from src.streaming_training import train_out_of_core, make_deployed_preprocessing, DEPLOYED_XGB_PARAMS
+from benchmarks.common import DEPLOYED_MODEL_PATH, PROJECT_DIR, make_data
+
+XGB_PARAMS = {'n_estimators': 20, 'n_jobs': 2}
+
+
+def test_streamed_fit_matches_in_memory_fit(tmp_path):
+    data = make_data(n_rows = 20_000)
+    train_path = str(tmp_path / 'train.csv')
+    data.to_csv(train_path, index = False)
+
+    streamed = train_out_of_core(train_path, xgb_params = XGB_PARAMS, chunksize = 5000, cache_dir = str(tmp_path / 'cache'), verbose = False)
+    in_memory = Pipeline([
+        ('categorical_encoding', make_deployed_preprocessing()),
+        ('xgb', XGBRegressor(**{**DEPLOYED_XGB_PARAMS, **XGB_PARAMS}))
+    ]).fit(data[FEATURE_COLUMNS], data.salary)
+
+    # The histogram bins are built from all the chunks, so both models find the same splits
+    np.testing.assert_allclose(streamed.predict(data[FEATURE_COLUMNS]), in_memory.predict(data[FEATURE_COLUMNS]), rtol = 1e-5, atol = 1e-3)
+
+
+def _pinned_xgboost_version():
+    with open(f'{PROJECT_DIR}/deployment_requirements.txt') as file:
+        pins = dict(line.strip().split('==') for line in file if '==' in line)
+    return pins['xgboost']
+
+
+@pytest.mark.skipif(xgb.__version__ != _pinned_xgboost_version(), reason = 'the deployed model is pickled for the pinned xgboost version')
+def test_deployed_model_loads_with_the_pinned_xgboost():
+    with open(DEPLOYED_MODEL_PATH, 'rb') as file:
+        model = pickle.load(file)
+
+    X = make_data(n_rows = 100)[FEATURE_COLUMNS]
+    assert model[-1].get_params()['n_estimators'] == DEPLOYED_XGB_PARAMS['n_estimators']
+    assert np.isfinite(model.predict(X)).all()